@@ -0,0 +1,459 @@
+import os
+import time
+from os.path import join
+import json
+import hashlib
+import asyncio
+import argparse
+import urllib.parse
+from danbooru_api import DanbooruApiBackend
+from danbooru_filters import DanbooruFilters
+from metrics import Metrics, TagMetrics
+from dedup_index import SeenIndex
+from content_store import ContentStore
+from progress_journal import ProgressJournal
+from rate_limiter import RateLimiter, is_challenge
+from http_client import content_range_total
+
+# aiohttp is only needed by the asyncio engine
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncDanbooruScraper(DanbooruFilters, TagMetrics):
+    """
+    An asyncio scraper for Danbooru that runs listing and download requests concurrently
+    through the JSON API, with the same tag loop, page jumping, filters and resume semantics
+    as DanbooruScraper.
+    """
+
+    def __init__(self,
+                 data_name,
+                 tags,
+                 rating=None,
+                 full_image=False,
+                 single_character=False,
+                 base_dir='scraped_images',
+                 video_flag=0,
+                 max_in_flight=100,
+                 per_host=16,
+                 pages_ahead=2,
+                 chunk_size=1024 * 1024,
+                 timeout=60,
+                 retries=5,
+                 request_rate=2.0,
+                 content_store=False,
+                 base_url="https://danbooru.donmai.us"):
+        """
+        Initializes the AsyncDanbooruScraper with the given parameters.
+
+        Args:
+            data_name (str): The name of the data category to scrape.
+            tags (list): List of tags to scrape.
+            rating (list, optional): List of ratings to scrape. Defaults to None.
+            full_image (bool, optional): Whether to scrape full images. Defaults to False.
+            single_character (bool, optional): Whether to scrape only single character images. Defaults to False.
+            base_dir (str, optional): Base directory for saving scraped images. Defaults to 'scraped_images'.
+            video_flag (int, optional): Flag to include videos. Defaults to 0.
+            max_in_flight (int, optional): Maximum number of concurrent requests. Defaults to 100.
+            per_host (int, optional): Maximum number of concurrent requests per host. Defaults to 16.
+            pages_ahead (int, optional): Number of listing pages fetched ahead of the current one. Defaults to 2.
+            chunk_size (int, optional): Size of the chunks written while downloading. Defaults to 1 MiB.
+            timeout (float, optional): HTTP request timeout in seconds. Defaults to 60.
+            retries (int, optional): Number of retries on connection errors, 429 and 5xx. Defaults to 5.
+            request_rate (float, optional): Initial number of requests per second sent to each host. Defaults to 2.0.
+            content_store (bool, optional): Whether images are kept once in a content-addressed store and hardlinked into the tag directories. Defaults to False.
+            base_url (str, optional): Base URL for Danbooru. Defaults to "https://danbooru.donmai.us".
+        """
+        self.base_url = base_url
+        self.data_name = data_name
+        self.rating_to_scrape = rating
+        self.full_image = full_image
+        self.single_character = single_character
+        self.base_dir = base_dir
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.pages_ahead = pages_ahead
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+
+        # Per-host request budgets that adapt to errors and latency
+        self.rate_limiter = RateLimiter(rate=request_rate)
+
+        # Images already downloaded under another tag or in an earlier run are linked instead of downloaded again
+        self.content_store = None
+        if content_store:
+            self.content_store = ContentStore(join(self.base_dir, 'content_store'))
+
+        if video_flag == 0:
+            self.allowed_formats = {"jpg", "jpeg", "png", "webp"}
+        elif video_flag == 1:
+            self.allowed_formats = {"jpg", "jpeg", "png", "webp", 'webm', 'mp4', 'mov'}
+        elif video_flag == 2:
+            self.allowed_formats = {'webm', 'mp4', 'mov'}
+
+        if self.single_character:
+            self.character_name = tags[0]
+        self.tags_list = [self.tag_query(tag) for tag in tags]
+
+        # Rejections are counted by the shared filters
+        self.metrics = Metrics(labels={"site": "danbooru"})
+
+        # The API backend only builds URLs and metadata here, requests go through aiohttp
+        self.api = DanbooruApiBackend(base_url=self.base_url)
+        self.clear_pages_limit = 3
+        self.host_slots = {}
+
+    async def scrape(self, max_images=10):
+        """
+        Scrapes every tag with a limit on the number of images.
+
+        Args:
+            max_images (int, optional): Maximum number of images to scrape per tag. Defaults to 10.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required by the asyncio engine, install it with 'pip install aiohttp'")
+
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        headers = {"User-Agent": self.api.client.session.headers["User-Agent"]}
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            self.session = session
+            for tag in self.tags_list:
+                await self.scrape_tag(tag, max_images)
+        print(f"\n{'='*100}")
+
+    async def scrape_tag(self, tag, max_images):
+        """
+        Scrapes one tag with a limit on the number of images.
+
+        Args:
+            tag (str): URL-encoded tag query.
+            max_images (int): Maximum number of images to scrape.
+        """
+        if len(self.tags_list) > 1:
+            output_dir = join(self.base_dir, self.data_name, tag)
+        else:
+            output_dir = join(self.base_dir, self.data_name)
+        os.makedirs(join(output_dir, 'labels'), exist_ok=True)
+        self.cur_tag = tag
+
+        header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" "
+        print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
+
+        journal = ProgressJournal(output_dir)
+        collected_images, last_page = [], 0
+        if journal.exists():
+            collected_images, last_page = journal.load()
+            print("\n-- Log file found")
+            print(f"-- Log last page: {last_page}")
+        seen = SeenIndex(collected_images)
+
+        page_num = 1
+        clear_pages_count = 0
+        end_of_page = False
+        failed = False
+        listings = {}
+        downloads = set()
+
+        # Downloads interrupted in an earlier run are resumed from their part files
+        for image_name, image_url in journal.pending_downloads().items():
+            downloads.add(asyncio.ensure_future(self.download(image_url, join(output_dir, image_name))))
+
+        while len(collected_images) < max_images and not end_of_page:
+            # Keep the next listing pages in flight while the current one is processed
+            for ahead in range(page_num, page_num + self.pages_ahead + 1):
+                if ahead not in listings:
+                    listings[ahead] = asyncio.ensure_future(self.fetch_posts(tag, ahead))
+            posts = await listings.pop(page_num)
+
+            header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" page {page_num} "
+            print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
+            if posts is None:
+                # Not the end of the results, the tag is left unfinished so a rerun resumes it
+                print(f"- Listing page {page_num} could not be fetched, stopping the tag")
+                failed = True
+                break
+            if not posts:
+                end_of_page = True
+                break
+
+            clear_count = 0
+            for post in posts:
+                if len(collected_images) >= max_images:
+                    break
+                post_url = self.api.post_url(post, tag)
+                accepted = self.parse_api_post(post, post_url) if post_url not in seen else None
+                if accepted is None:
+                    clear_count += 1
+                    continue
+
+                image_url, image_extension, metadata = accepted
+                new_filename = f"{tag.split('+')[0]}_{(5-len(str(len(collected_images)+1)))*'0'}{len(collected_images)+1}"
+                print(f"\n- Processing: {post_url}")
+                image_path = join(output_dir, f"{new_filename}.{image_extension}")
+                downloads.add(asyncio.ensure_future(self.download(image_url, image_path)))
+                self.save_metadata(join(output_dir, f"{new_filename}.json"), metadata)
+
+                collected_images.append(post_url)
+                seen.add(post_url)
+                journal.append(post_url, last_page, collected_images, image_url, f"{new_filename}.{image_extension}")
+                print(f"- Collected {len(collected_images)}/{max_images}")
+
+            if clear_count == len(posts):
+                clear_pages_count += 1
+            else:
+                clear_pages_count = 0
+                if page_num > last_page:
+                    last_page = page_num
+                    journal.record_page(last_page)
+                    print(f"\n{'*'*100}")
+                    print(f"\nNew last page: {last_page}")
+            if clear_pages_count == self.clear_pages_limit:
+                header = f" Jumping to page {last_page} "
+                print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
+                page_num = last_page-1
+                # Pages fetched ahead of the jump are not needed anymore
+                for listing in listings.values():
+                    listing.cancel()
+                listings = {}
+            page_num += 1
+
+        for listing in listings.values():
+            listing.cancel()
+        if downloads:
+            await asyncio.gather(*downloads)
+
+        if failed:
+            journal.close()
+            print(f"\n-- Scraping stopped for tag \"{tag.split('+')[0]}\"")
+            print(f"-- Total images collected: {len(collected_images)}")
+            return
+        journal.compact(collected_images, page_num-1)
+        journal.close()
+        print(f"\n-- Scraping complete for tag \"{tag.split('+')[0]}\"")
+        print(f"-- Total images collected: {len(collected_images)}")
+        print(f"-- Last page: {page_num-1}")
+
+    def host_slot(self, url):
+        """
+        Returns the semaphore limiting concurrent requests to the host of a URL.
+
+        Args:
+            url (str): URL to request.
+
+        Returns:
+            asyncio.Semaphore: Semaphore of the host.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self.host_slots[host]
+
+    async def request(self, url, handle, headers=None):
+        """
+        Sends a GET request under the global and per-host limits and the rate limiter,
+        retrying on connection errors, 429 and 5xx.
+
+        Args:
+            url (str): URL to request.
+            handle (coroutine function): Called with the successful response, its result is returned.
+            headers (dict, optional): Extra request headers. Defaults to None.
+
+        Returns:
+            The result of handle, or None if the request failed.
+        """
+        for attempt in range(self.retries + 1):
+            # The rate limiter spaces the retries, pausing the host on Retry-After
+            await asyncio.sleep(max(0, self.rate_limiter.reserve(url)))
+            start = time.monotonic()
+            try:
+                async with self.semaphore, self.host_slot(url):
+                    async with self.session.get(url, headers=headers) as response:
+                        throttled = self.rate_limiter.record(url, response.status, time.monotonic() - start,
+                                                             response.headers.get("Retry-After"),
+                                                             is_challenge(response.status, response.headers))
+                        # 206 and 416 answer the Range requests of resumed downloads
+                        if response.status in (200, 206, 416):
+                            return await handle(response)
+                        if response.status < 500 and not throttled:
+                            print(f"- Request failed: {url} (status {response.status})")
+                            return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"- Request failed: {url} ({e.__class__.__name__})")
+                self.rate_limiter.record(url, latency=time.monotonic() - start)
+        return None
+
+    async def fetch_posts(self, tag, page_num):
+        """
+        Fetches one listing page of posts as JSON.
+
+        Args:
+            tag (str): URL-encoded tag query.
+            page_num (int): Page number to fetch.
+
+        Returns:
+            list: List of post dicts, or None if the page could not be fetched.
+        """
+        url = f"{self.base_url}/posts.json?tags={tag}&page={page_num}&limit={self.api.limit}"
+
+        async def handle(response):
+            posts = await response.json(content_type=None)
+            return posts if isinstance(posts, list) else None
+
+        return await self.request(url, handle)
+
+    async def download(self, image_url, image_path):
+        """
+        Streams an image to image_path + ".part" and renames it once its length is verified,
+        resuming an interrupted transfer with a Range request.
+
+        Args:
+            image_url (str): URL of the image to download.
+            image_path (str): Path to save the image to.
+        """
+        expected = None
+        if self.content_store is not None:
+            expected = self.content_store.key(image_url)
+            if expected is not None and self.content_store.link(expected, image_path):
+                print(f"- Image linked from the content store: {os.path.basename(image_path)}")
+                return
+        part_path = image_path + ".part"
+
+        async def handle(response):
+            if response.status == 416:
+                # The part file is already complete, or larger than the remote file
+                if content_range_total(response.headers.get("Content-Range")) == os.path.getsize(part_path):
+                    return True
+                os.remove(part_path)
+                return False
+            if response.status == 206:
+                offset = int(response.headers["Content-Range"].split()[1].split("-")[0])
+                total = content_range_total(response.headers.get("Content-Range"))
+            else:
+                offset = 0
+                total = response.content_length
+            with open(part_path, 'r+b' if offset else 'wb') as f:
+                f.seek(offset)
+                f.truncate()
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    f.write(chunk)
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                print(f"- Download incomplete: {image_url} ({size}/{total} bytes), resuming")
+                if size > total:
+                    os.remove(part_path)
+                return False
+            return True
+
+        for attempt in range(self.retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            complete = await self.request(image_url, handle, headers)
+            if complete is not False:
+                break
+        if not complete:
+            return
+
+        digest = hashlib.md5()
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        os.replace(part_path, image_path)
+        if self.content_store is None or self.content_store.add(image_path, digest.hexdigest(), expected):
+            print(f"- Image saved: {os.path.basename(image_path)}")
+
+    def save_metadata(self, json_path, metadata):
+        """
+        Saves metadata as a JSON file.
+
+        Args:
+            json_path (str): Path of the JSON file.
+            metadata (dict): Metadata to save.
+        """
+        with open(json_path, 'w') as f:
+            json.dump(metadata, f, indent=4)
+        print(f"- Metadata saved: {os.path.basename(json_path)}")
+
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description="Asyncio Danbooru Scraper")
+
+    parser.add_argument(
+        "--tag",
+        type=str,
+        required=True,
+        help="A specific tag to scrape"
+    )
+
+    parser.add_argument(
+        "--rating",
+        type=str,
+        default=None,
+        help="A specific rating to scrape (default: None)"
+    )
+
+    parser.add_argument(
+        "--base_dir",
+        type=str,
+        default='scraped_images',
+        help="Download directory (default: scraped_images)"
+    )
+
+    parser.add_argument(
+        "--max",
+        type=int,
+        default=99999,
+        help="Maximum number of images to scrape (default: 99999)"
+    )
+
+    parser.add_argument(
+        "--sample",
+        action='store_true',
+        help="If set, scrape sample image (default: False)"
+    )
+
+    parser.add_argument(
+        "--max_in_flight",
+        type=int,
+        default=100,
+        help="Maximum number of concurrent requests (default: 100)"
+    )
+
+    parser.add_argument(
+        "--request_rate",
+        type=float,
+        default=2.0,
+        help="Initial number of requests per second sent to each host, adjusted while scraping (default: 2.0)"
+    )
+
+    parser.add_argument(
+        "--content_store",
+        action='store_true',
+        help="If set, keep every image once in a content-addressed store and hardlink it into the tag directories (default: False)"
+    )
+
+    args = parser.parse_args()
+
+    tag = args.tag.replace(' ', '+')
+    rating = [i.lower() for i in args.rating.split(',')] if args.rating else None
+    dir_name = f"danbooru_{tag}"
+    if rating is not None: dir_name += f"_{rating}"
+    if args.sample: dir_name += '_sample'
+
+    scraper = AsyncDanbooruScraper(data_name = dir_name,
+                                   tags = [tag],
+                                   rating = rating,
+                                   full_image = not args.sample,
+                                   base_dir = args.base_dir,
+                                   max_in_flight = args.max_in_flight,
+                                   request_rate = args.request_rate,
+                                   content_store = args.content_store)
+    asyncio.run(scraper.scrape(max_images=args.max))
@@ -0,0 +1,461 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The recorded listing pages hold one kind of article, repeated for every listed post
+ARTICLES = re.compile(r"[ \t]*<article\b.*</article>\n?", re.S)
+ARTICLE = re.compile(r"[ \t]*<article\b.*?</article>\n?", re.S)
+
+RATING_NAMES = {'g': 'General', 's': 'Sensitive', 'q': 'Questionable', 'e': 'Explicit'}
+SANKAKU_RATING_CLASSES = {'g': 'rating-s', 's': 'rating-s', 'q': 'rating-q', 'e': 'rating-e'}
+
+
+class FakeBooru:
+    """
+    A local Danbooru and Sankaku Complex serving the recorded pages of benchmarks/fixtures for a
+    generated set of posts, with injected latency, bandwidth limit and errors.
+    """
+    def __init__(self,
+                 posts=400,
+                 page_size=20,
+                 image_size=256 * 1024,
+                 latency=0.0,
+                 bandwidth=None,
+                 error_rate=0.0,
+                 truncate_rate=0.0,
+                 seed=0,
+                 host="127.0.0.1",
+                 port=0):
+        """
+        Initializes the FakeBooru and generates its posts.
+
+        Args:
+            posts (int, optional): Number of posts of every tag. Defaults to 400.
+            page_size (int, optional): Number of posts per listing page, the JSON API uses its limit parameter. Defaults to 20.
+            image_size (int, optional): Size of an original image in bytes, samples are a quarter of it. Defaults to 256 KiB.
+            latency (float, optional): Seconds waited before every response. Defaults to 0.0.
+            bandwidth (float, optional): Bytes per second sent by every response, None for no limit. Defaults to None.
+            error_rate (float, optional): Fraction of requests answered with a 503. Defaults to 0.0.
+            truncate_rate (float, optional): Fraction of image responses cut in half. Defaults to 0.0.
+            seed (int, optional): Seed of the injected errors. Defaults to 0.
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on, 0 for a free one. Defaults to 0.
+        """
+        self.page_size = page_size
+        self.image_size = image_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+        self.templates = {}
+        for site in ("danbooru", "sankaku"):
+            for page in ("listing", "post"):
+                with open(os.path.join(FIXTURES_DIR, site, f"{page}.html"), "r", encoding="utf-8") as f:
+                    self.templates[site, page] = f.read()
+        with open(os.path.join(FIXTURES_DIR, "danbooru", "posts.json"), "r", encoding="utf-8") as f:
+            self.api_template = json.load(f)[0]
+
+        # Newest post first, like the listings of both sites
+        self.posts = []
+        self.posts_by_md5 = {}
+        for index in range(posts):
+            post_id = 1000000 + posts - index
+            post = {
+                "id": post_id,
+                "md5": hashlib.md5(self.image(post_id, "original")).hexdigest(),
+                "file_ext": "mp4" if index % 10 == 9 else "png" if index % 3 == 0 else "jpg",
+                "rating": "gsqe"[index % 4] if index % 2 else "g",
+            }
+            self.posts.append(post)
+            self.posts_by_md5[post["md5"]] = post
+        self.posts_by_id = {str(post["id"]): post for post in self.posts}
+
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.truncated = 0
+        self.bytes_sent = 0
+
+        self.server = ThreadingHTTPServer((host, port), FakeBooruHandler)
+        self.server.daemon_threads = True
+        self.server.booru = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        """
+        str: Base URL of the server, for both sites.
+        """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def image(self, post_id, kind):
+        """
+        Generates the content of an image.
+
+        Args:
+            post_id (int): ID of the post.
+            kind (str): "original" or "sample".
+
+        Returns:
+            bytes: Content of the image.
+        """
+        size = self.image_size if kind == "original" else self.image_size // 4
+        block = f"{kind}:{post_id}:".encode()
+        return (block * (size // len(block) + 1))[:size]
+
+    def chance(self, rate):
+        """
+        Draws whether an injected event happens.
+
+        Args:
+            rate (float): Probability of the event.
+
+        Returns:
+            bool: True if the event happens.
+        """
+        if rate <= 0:
+            return False
+        with self.random_lock:
+            return self.random.random() < rate
+
+    def render(self, template, post):
+        """
+        Fills the tokens of a recorded page or article with the values of a post.
+
+        Args:
+            template (str): Page or article with __TOKEN__ placeholders.
+            post (dict): Post to render.
+
+        Returns:
+            str: The rendered HTML.
+        """
+        host = urllib.parse.urlsplit(self.base_url).netloc
+        return (template.replace("__POST_ID__", str(post["id"]))
+                        .replace("__MD5__", post["md5"])
+                        .replace("__FILE_EXT__", post["file_ext"])
+                        .replace("__RATING_NAME__", RATING_NAMES[post["rating"]])
+                        .replace("__RATING_CLASS__", SANKAKU_RATING_CLASSES[post["rating"]])
+                        .replace("__RATING__", post["rating"])
+                        .replace("__HOST__", host))
+
+    def page_posts(self, page, limit):
+        """
+        Selects the posts of a listing page.
+
+        Args:
+            page (str): Page number, or Danbooru's "a<id>" and "b<id>" post ID cursors.
+            limit (int): Number of posts per page.
+
+        Returns:
+            list: Posts of the page, newest first.
+        """
+        if page.startswith("b") and page[1:].isdigit():
+            return [post for post in self.posts if post["id"] < int(page[1:])][:limit]
+        if page.startswith("a") and page[1:].isdigit():
+            newer = [post for post in self.posts if post["id"] > int(page[1:])]
+            return newer[-limit:]
+        page_num = int(page) if page.isdigit() else 1
+        return self.posts[(page_num - 1) * limit:page_num * limit]
+
+    def listing(self, site, page):
+        """
+        Renders a listing page.
+
+        Args:
+            site (str): "danbooru" or "sankaku".
+            page (str): Page parameter of the request.
+
+        Returns:
+            str: The rendered HTML, with no posts container past the last page.
+        """
+        template = self.templates[site, "listing"]
+        posts = self.page_posts(page, self.page_size)
+        if not posts:
+            return ARTICLES.sub("", template).replace("posts-container", "no-posts")
+        article = ARTICLE.search(template).group(0)
+        return ARTICLES.sub(lambda _: "".join(self.render(article, post) for post in posts), template)
+
+    def api_listing(self, page, limit):
+        """
+        Renders a page of the Danbooru JSON API.
+
+        Args:
+            page (str): Page parameter of the request.
+            limit (int): Limit parameter of the request.
+
+        Returns:
+            str: The JSON list of posts.
+        """
+        posts = []
+        for post in self.page_posts(page, limit):
+            api_post = dict(self.api_template)
+            api_post.update({
+                "id": post["id"],
+                "md5": post["md5"],
+                "rating": post["rating"],
+                "file_ext": post["file_ext"],
+                "source": f"https://twitter.com/artist_a/status/{post['id']}",
+                "file_url": f"{self.base_url}/data/original/{post['md5']}.{post['file_ext']}",
+                "large_file_url": f"{self.base_url}/data/sample/sample-{post['md5']}.jpg",
+                "preview_file_url": f"{self.base_url}/data/180x180/{post['md5']}.jpg",
+            })
+            api_post.pop("media_asset", None)
+            posts.append(api_post)
+        return json.dumps(posts)
+
+    def record(self, sent=0, error=False, truncated=False):
+        """
+        Adds a response to the server statistics.
+
+        Args:
+            sent (int, optional): Number of body bytes sent. Defaults to 0.
+            error (bool, optional): Whether an error was injected. Defaults to False.
+            truncated (bool, optional): Whether the body was cut. Defaults to False.
+        """
+        with self.stats_lock:
+            self.requests += 1
+            self.errors += error
+            self.truncated += truncated
+            self.bytes_sent += sent
+
+    def stats(self):
+        """
+        Returns the server statistics.
+
+        Returns:
+            dict: Number of requests, injected errors, truncated images and bytes sent.
+        """
+        with self.stats_lock:
+            return {"requests": self.requests, "errors": self.errors,
+                    "truncated": self.truncated, "bytes_sent": self.bytes_sent}
+
+    def start(self):
+        """
+        Serves requests on a background thread.
+
+        Returns:
+            str: Base URL of the server.
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeBooruHandler(BaseHTTPRequestHandler):
+    """
+    Routes the requests of the scrapers to the pages of the FakeBooru.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        booru = self.server.booru
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        page = query.get("page", ["1"])[0]
+
+        if booru.latency:
+            time.sleep(booru.latency)
+        if booru.chance(booru.error_rate):
+            booru.record(error=True)
+            self.send_body(503, b"Service Unavailable", "text/plain")
+            return
+
+        if url.path.startswith("/data/"):
+            self.send_image(booru, url.path)
+        elif url.path == "/posts.json":
+            limit = int(query.get("limit", ["20"])[0])
+            self.send_page(booru, booru.api_listing(page, limit), "application/json")
+        elif url.path == "/posts":
+            self.send_page(booru, booru.listing("danbooru", page), "text/html")
+        elif url.path == "/en/posts":
+            self.send_page(booru, booru.listing("sankaku", page), "text/html")
+        elif url.path.startswith("/posts/") and url.path[len("/posts/"):] in booru.posts_by_id:
+            post = booru.posts_by_id[url.path[len("/posts/"):]]
+            self.send_page(booru, booru.render(booru.templates["danbooru", "post"], post), "text/html")
+        elif url.path.startswith("/en/posts/") and url.path[len("/en/posts/"):] in booru.posts_by_id:
+            post = booru.posts_by_id[url.path[len("/en/posts/"):]]
+            self.send_page(booru, booru.render(booru.templates["sankaku", "post"], post), "text/html")
+        elif url.path == "/en/":
+            self.send_page(booru, "<html><body></body></html>", "text/html")
+        else:
+            booru.record()
+            self.send_body(404, b"Not Found", "text/plain")
+
+    def send_page(self, booru, text, content_type):
+        """
+        Sends a rendered page.
+
+        Args:
+            booru (FakeBooru): Server the page comes from.
+            text (str): Page to send.
+            content_type (str): MIME type of the page.
+        """
+        body = text.encode("utf-8")
+        booru.record(sent=len(body))
+        self.send_body(200, body, content_type + "; charset=utf-8")
+
+    def send_image(self, booru, path):
+        """
+        Sends an image, honoring Range requests and cutting it in half when truncation is injected.
+
+        Args:
+            booru (FakeBooru): Server the image comes from.
+            path (str): Path of the image, its file name holds the md5 of the original.
+        """
+        name = path.rsplit("/", 1)[-1].split(".")[0]
+        kind = "sample" if name.startswith("sample-") else "original"
+        post = booru.posts_by_md5.get(name.replace("sample-", ""))
+        if post is None:
+            booru.record()
+            self.send_body(404, b"Not Found", "text/plain")
+            return
+        body = booru.image(post["id"], kind)
+
+        start = 0
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if start >= len(body):
+                booru.record()
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "image/png" if post["file_ext"] == "png" and kind == "original" else "image/jpeg")
+        self.send_header("Content-Length", str(len(body) - start))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+
+        if booru.chance(booru.truncate_rate):
+            sent = self.write_body(booru, body[start:start + (len(body) - start) // 2])
+            booru.record(sent=sent, truncated=True)
+            self.close_connection = True
+            return
+        booru.record(sent=self.write_body(booru, body[start:]))
+
+    def send_body(self, status, body, content_type):
+        """
+        Sends a complete response.
+
+        Args:
+            status (int): HTTP status code.
+            body (bytes): Response body.
+            content_type (str): MIME type of the body.
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.write_body(self.server.booru, body)
+
+    def write_body(self, booru, body):
+        """
+        Writes a response body, at most at the configured bandwidth.
+
+        Args:
+            booru (FakeBooru): Server the body comes from.
+            body (bytes): Body to write.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        if not booru.bandwidth:
+            self.wfile.write(body)
+            return len(body)
+        chunk_size = 16 * 1024
+        start = time.monotonic()
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            # Sleep until the bytes sent so far fit the bandwidth
+            delay = (offset + chunk_size) / booru.bandwidth - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        return len(body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Danbooru and Sankaku Complex serving the recorded fixtures")
+    parser.add_argument(
+        "--port", 
+        type=int, 
+        default=8000, 
+        help="Port to listen on (default: 8000)"
+    )
+    parser.add_argument(
+        "--posts", 
+        type=int, 
+        default=400, 
+        help="Number of posts of every tag (default: 400)"
+    )
+    parser.add_argument(
+        "--image_size", 
+        type=int, 
+        default=256 * 1024, 
+        help="Size of an original image in bytes (default: 262144)"
+    )
+    parser.add_argument(
+        "--latency", 
+        type=float, 
+        default=0.0, 
+        help="Seconds waited before every response (default: 0.0)"
+    )
+    parser.add_argument(
+        "--bandwidth", 
+        type=float, 
+        default=None, 
+        help="Bytes per second sent by every response (default: no limit)"
+    )
+    parser.add_argument(
+        "--error_rate", 
+        type=float, 
+        default=0.0, 
+        help="Fraction of requests answered with a 503 (default: 0.0)"
+    )
+    parser.add_argument(
+        "--truncate_rate", 
+        type=float, 
+        default=0.0, 
+        help="Fraction of image responses cut in half (default: 0.0)"
+    )
+    args = parser.parse_args()
+
+    booru = FakeBooru(posts=args.posts,
+                      image_size=args.image_size,
+                      latency=args.latency,
+                      bandwidth=args.bandwidth,
+                      error_rate=args.error_rate,
+                      truncate_rate=args.truncate_rate,
+                      port=args.port)
+    print(f"Serving Danbooru on {booru.base_url} and Sankaku Complex on {booru.base_url}/en/")
+    try:
+        booru.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(booru.stats())
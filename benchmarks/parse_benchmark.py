@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import argparse
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from html_parsing import parse_html, LISTING_STRAINER, DANBOORU_POST_STRAINER, SANKAKU_POST_STRAINER
+from fake_booru import FakeBooru
+
+
+def page_kind(html):
+    """
+    Guesses which scraper page a saved page is.
+
+    Args:
+        html (str): Page source.
+
+    Returns:
+        tuple: Name of the page kind, its strainer and its required selectors.
+    """
+    if "posts-container" in html:
+        return "listing", LISTING_STRAINER, ("div.posts-container",)
+    if "tag-sidebar" in html:
+        return "sankaku post", SANKAKU_POST_STRAINER, ("#stats", "#tag-sidebar")
+    return "danbooru post", DANBOORU_POST_STRAINER, ("#post-information", "#tag-list")
+
+
+def fixture_pages():
+    """
+    Renders the recorded pages of benchmarks/fixtures the way the fake booru serves them,
+    a full listing page and a post page of each site.
+
+    Returns:
+        list: List of (name, page source) pairs.
+    """
+    booru = FakeBooru(posts=20)
+    try:
+        post = booru.posts[0]
+        return [(f"{site}/{page}", booru.listing(site, "1") if page == "listing" else booru.render(booru.templates[site, page], post))
+                for site in ("danbooru", "sankaku") for page in ("listing", "post")]
+    finally:
+        booru.server.server_close()
+
+
+def time_parse(parse, html, repeat):
+    """
+    Times a parse function.
+
+    Args:
+        parse (callable): Function parsing the page source.
+        html (str): Page source.
+        repeat (int): Number of parses.
+
+    Returns:
+        float: Mean time per parse in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parsing micro-benchmark on saved listing and post pages")
+    parser.add_argument(
+        "pages", 
+        nargs="*", 
+        help="Saved page sources (default: the rendered pages of benchmarks/fixtures)"
+    )
+    parser.add_argument(
+        "--repeat", 
+        type=int, 
+        default=50, 
+        help="Number of parses per page and parser (default: 50)"
+    )
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    pages = pages or fixture_pages()
+
+    print(f"{'page':<40} {'kind':<14} {'html.parser':>12} {'lxml':>10} {'selective':>10} {'speedup':>8}")
+    for name, html in pages:
+        kind, strainer, required = page_kind(html)
+        baseline = time_parse(lambda page: BeautifulSoup(page, "html.parser"), html, args.repeat)
+        full = time_parse(lambda page: parse_html(page), html, args.repeat)
+        selective = time_parse(lambda page: parse_html(page, strainer, required), html, args.repeat)
+        print(f"{name:<40} {kind:<14} {baseline:>10.2f}ms {full:>8.2f}ms {selective:>8.2f}ms {baseline / selective:>7.1f}x")
@@ -0,0 +1,277 @@
+import os
+import sys
+import ast
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_booru import FakeBooru
+
+# Every configuration starts from these, the fake server is local so the request budget is not the bottleneck
+BASE_OPTIONS = {"request_rate": 1000.0, "full_image": True}
+
+DEFAULT_CONFIGS = ["browser_workers=1,download_workers=1",
+                   "browser_workers=4,download_workers=4",
+                   "browser_workers=8,download_workers=8"]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".webm", ".mp4", ".mov")
+
+
+def parse_config(config):
+    """
+    Parses a configuration given on the command line.
+
+    Args:
+        config (str): Comma-separated scraper options, e.g. "browser_workers=4,queue_size=16".
+
+    Returns:
+        dict: Scraper keyword arguments.
+    """
+    options = {}
+    for option in filter(None, config.split(",")):
+        name, _, value = option.partition("=")
+        try:
+            options[name.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            options[name.strip()] = value.strip()
+    return options
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        int: Peak RSS in bytes, or None if it cannot be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_scraper(job):
+    """
+    Scrapes the fake server in the current process and measures the run.
+
+    Args:
+        job (dict): Site, base URL, image limit and scraper options of the run.
+
+    Returns:
+        dict: Number of posts, bytes downloaded, wall time, CPU time and peak RSS.
+    """
+    with tempfile.TemporaryDirectory() as base_dir:
+        options = dict(BASE_OPTIONS, **job["options"])
+        if job["site"] == "danbooru":
+            from danbooru_scraper import DanbooruScraper
+            scraper_class = DanbooruScraper
+        else:
+            from sankaku_scraper import SankakuScraper
+            scraper_class = SankakuScraper
+            cookie_file_path = os.path.join(base_dir, "cookies.txt")
+            with open(cookie_file_path, "w") as f:
+                f.write("127.0.0.1\tFALSE\t/\tFALSE\t\tbenchmark\t1\n")
+            options.setdefault("cookie_file_path", cookie_file_path)
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            scraper = scraper_class("benchmark", tags=["char_a"], base_dir=base_dir, base_url=job["base_url"], **options)
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            scraper.scrape_limited_by_images(max_images=job["max_images"])
+            scraper.close()
+            elapsed = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+
+        images = [os.path.join(root, name) for root, _, names in os.walk(base_dir)
+                  for name in names if name.lower().endswith(IMAGE_EXTENSIONS)]
+        return {
+            "posts": len(scraper.collected_images),
+            "images": len(images),
+            "bytes": sum(os.path.getsize(path) for path in images),
+            "seconds": elapsed,
+            "cpu_seconds": cpu,
+            "peak_rss": peak_rss(),
+        }
+
+
+def run_job(job):
+    """
+    Runs a scraper in a child process, so the CPU time and peak RSS are its own.
+
+    Args:
+        job (dict): Site, base URL, image limit and scraper options of the run.
+
+    Returns:
+        dict: Measurements returned by run_scraper(), or None if the run failed.
+    """
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(job)],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        print(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}")
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def print_row(site, config, result, baseline=None):
+    """
+    Prints the measurements of a run.
+
+    Args:
+        site (str): Scraped site.
+        config (str): Configuration of the run.
+        result (dict): Measurements of the run.
+        baseline (dict, optional): Measurements of the same run to compare with. Defaults to None.
+    """
+    posts_per_second = result["posts"] / result["seconds"]
+    megabytes_per_second = result["bytes"] / result["seconds"] / 1e6
+    cpu_percent = result["cpu_seconds"] / result["seconds"] * 100
+    rss = f"{result['peak_rss'] / 1e6:.0f}MB" if result["peak_rss"] else "n/a"
+    change = ""
+    if baseline is not None:
+        change = f"{(posts_per_second / (baseline['posts'] / baseline['seconds']) - 1) * 100:+.1f}%"
+    print(f"{site:<9} {config:<44} {result['posts']:>6} {posts_per_second:>8.1f} {megabytes_per_second:>8.2f} "
+          f"{cpu_percent:>6.0f}% {rss:>8} {change:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end scraper benchmark against a local fake booru")
+    parser.add_argument(
+        "--site", 
+        nargs="+", 
+        choices=["danbooru", "sankaku"], 
+        default=["danbooru", "sankaku"], 
+        help="Sites to benchmark (default: danbooru sankaku)"
+    )
+    parser.add_argument(
+        "--config", 
+        action="append", 
+        help="Comma-separated scraper options of a configuration, can be repeated (default: 1, 4 and 8 workers)"
+    )
+    parser.add_argument(
+        "--max_images", 
+        type=int, 
+        default=100, 
+        help="Number of images scraped per run (default: 100)"
+    )
+    parser.add_argument(
+        "--posts", 
+        type=int, 
+        default=400, 
+        help="Number of posts served (default: 400)"
+    )
+    parser.add_argument(
+        "--image_size", 
+        type=int, 
+        default=256 * 1024, 
+        help="Size of an original image in bytes (default: 262144)"
+    )
+    parser.add_argument(
+        "--latency", 
+        type=float, 
+        default=0.05, 
+        help="Seconds waited by the server before every response (default: 0.05)"
+    )
+    parser.add_argument(
+        "--bandwidth", 
+        type=float, 
+        default=None, 
+        help="Bytes per second sent by every response (default: no limit)"
+    )
+    parser.add_argument(
+        "--error_rate", 
+        type=float, 
+        default=0.0, 
+        help="Fraction of requests answered with a 503 (default: 0.0)"
+    )
+    parser.add_argument(
+        "--truncate_rate", 
+        type=float, 
+        default=0.0, 
+        help="Fraction of image responses cut in half (default: 0.0)"
+    )
+    parser.add_argument(
+        "--save", 
+        type=str, 
+        default=None, 
+        help="Write the results to a JSON file (default: None)"
+    )
+    parser.add_argument(
+        "--compare", 
+        type=str, 
+        default=None, 
+        help="Results file of an earlier run to compare posts/sec with (default: None)"
+    )
+    parser.add_argument(
+        "--tolerance", 
+        type=float, 
+        default=0.1, 
+        help="Posts/sec drop against --compare reported as a regression (default: 0.1)"
+    )
+    parser.add_argument(
+        "--child", 
+        type=str, 
+        default=None, 
+        help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_scraper(json.loads(args.child))))
+        sys.exit(0)
+
+    server = {"posts": args.posts, "image_size": args.image_size, "latency": args.latency, "bandwidth": args.bandwidth,
+              "error_rate": args.error_rate, "truncate_rate": args.truncate_rate, "max_images": args.max_images}
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+        if previous["server"] != server:
+            print(f"Warning: {args.compare} was measured with other server settings: {previous['server']}")
+        baseline = previous["results"]
+
+    booru = FakeBooru(posts=args.posts,
+                      image_size=args.image_size,
+                      latency=args.latency,
+                      bandwidth=args.bandwidth,
+                      error_rate=args.error_rate,
+                      truncate_rate=args.truncate_rate)
+    base_url = booru.start()
+
+    results = {}
+    regressions = []
+    print(f"{'site':<9} {'config':<44} {'posts':>6} {'posts/s':>8} {'MB/s':>8} {'cpu':>7} {'peak RSS':>8} {'change':>8}")
+    for site in args.site:
+        for config in args.config or DEFAULT_CONFIGS:
+            job = {"site": site, "base_url": base_url, "max_images": args.max_images, "options": parse_config(config)}
+            result = run_job(job)
+            if result is None:
+                continue
+            key = f"{site} {config}"
+            results[key] = result
+            print_row(site, config, result, baseline.get(key))
+            if key in baseline:
+                previous = baseline[key]["posts"] / baseline[key]["seconds"]
+                if result["posts"] / result["seconds"] < previous * (1 - args.tolerance):
+                    regressions.append(key)
+    booru.stop()
+
+    stats = booru.stats()
+    print(f"\nServer: {stats['requests']} requests, {stats['errors']} errors and {stats['truncated']} truncated images injected, "
+          f"{stats['bytes_sent'] / 1e6:.1f}MB sent")
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump({"server": server, "results": results}, f, indent=4)
+    if regressions:
+        print(f"Throughput regressions: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,778 @@
+import os
+import copy
+import functools
+import time
+from contextlib import contextmanager
+from os.path import join
+import json
+import requests
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+import selenium
+from download_pool import DownloadPool
+from content_store import ContentStore
+from http_client import HttpClient
+from dedup_index import SeenIndex
+from progress_journal import ProgressJournal
+from metadata_store import SqliteMetadataStore
+from page_wait import PageWaiter
+from rate_limiter import RateLimiter
+from driver_pool import WebDriverPool
+from lean_browser import apply_lean_options, block_resources
+from pipeline import Stage
+from metrics import Metrics, TagMetrics
+from tag_scheduler import TagScheduler
+
+class BooruScraper(TagMetrics):
+    """
+    The scraping engine shared by the site scrapers. Every listing page goes through the same stages:
+    discover the posts of the page, prefilter them from the listing, fetch and parse the post pages,
+    download the images and persist the metadata and progress. Fetch and download are bounded queues
+    with their own workers, discover and persist run on the scraping thread because the page cursor
+    and the file numbers depend on their order.
+
+    A site scraper supplies the URL building and parsing: tag_query(), listing_url(), discover(),
+    prefilter() and fetch_post(). It times its page loads with timed_load(), its parsing with timed()
+    and counts the posts its filters reject with count_rejection().
+    """
+    # Name of the site in the metadata store
+    SITE = None
+    # Subdirectory of the tag directory the JSON metadata is written to
+    METADATA_DIR = ""
+    # Attributes describing the tag being scraped, swapped in and out by the tag scheduler
+    TAG_STATE_FIELDS = ["cur_tag", "output_dir", "search_url", "journal", "page_num", "last_page",
+                        "clear_pages_count", "end_of_page", "collected_images", "seen",
+                        "cursor", "newest_id", "oldest_id", "tag_started", "held_records", "metadata_batch"]
+
+    def __init__(self,
+                 data_name,
+                 tags=None,
+                 rating=None,
+                 full_image=False,
+                 single_character=False,
+                 base_dir = 'scraped_images',
+                 video_flag = 0,
+                 download_workers=4,
+                 download_per_host=None,
+                 chunk_size=1024 * 1024,
+                 timeout=60,
+                 dedup_across_tags=False,
+                 metadata_sink="json",
+                 page_timeout=10,
+                 browser_workers=1,
+                 queue_size=64,
+                 selective_parse=True,
+                 request_rate=2.0,
+                 content_store=False,
+                 lean_browser=True,
+                 incremental=False,
+                 metrics_port=None,
+                 base_url=None):
+        """
+        Initializes the state, HTTP client and pipeline stages shared by the site scrapers.
+
+        Args:
+            data_name (str): The name of the data category to scrape.
+            tags (list, optional): List of tags to scrape. Defaults to None.
+            rating (list, optional): List of ratings to scrape. Defaults to None.
+            full_image (bool, optional): Whether to scrape full images. Defaults to False.
+            single_character (bool, optional): Whether to scrape only single character images. Defaults to False.
+            base_dir (str, optional): Base directory for saving scraped images. Defaults to 'scraped_images'.
+            video_flag (int, optional): Flag to include videos. Defaults to 0.
+            download_workers (int, optional): Number of concurrent image downloads. Defaults to 4.
+            download_per_host (int, optional): Maximum number of concurrent image downloads from one host, across the tag workers. Defaults to download_workers.
+            chunk_size (int, optional): Size of the chunks written while downloading. Defaults to 1 MiB.
+            timeout (float, optional): HTTP request timeout in seconds. Defaults to 60.
+            dedup_across_tags (bool, optional): Whether a post collected under one tag is skipped under the others. Defaults to False.
+            metadata_sink (str, optional): Where metadata is written, "json" files or a "sqlite" database. Defaults to "json".
+            page_timeout (float, optional): Maximum number of seconds to wait for a page to be ready. Defaults to 10.
+            browser_workers (int, optional): Number of workers of the fetch stage, each with its own browser when one is used. Defaults to 1.
+            queue_size (int, optional): Maximum number of posts waiting in the fetch and download queues. Defaults to 64.
+            selective_parse (bool, optional): Whether only the subtrees read by the scraper are parsed. Defaults to True.
+            request_rate (float, optional): Initial number of requests per second sent to each host. Defaults to 2.0.
+            content_store (bool, optional): Whether images are kept once in a content-addressed store and hardlinked into the tag directories. Defaults to False.
+            lean_browser (bool, optional): Whether Chrome skips images, media, fonts, stylesheets and ads. Defaults to True.
+            incremental (bool, optional): Whether listings are paged by post ID from the collected posts instead of by page number. Defaults to False.
+            metrics_port (int, optional): Port of the Prometheus metrics endpoint, not served if None. Defaults to None.
+            base_url (str, optional): Base URL of the site. Defaults to None.
+        """
+        self.base_url = base_url
+        self.data_name = data_name
+        self.rating_to_scrape = rating
+        self.full_image = full_image
+        self.single_character = single_character
+        self.base_dir = base_dir
+
+        if video_flag == 0:
+            self.allowed_formats = {"jpg", "jpeg", "png", "webp"}
+        elif video_flag == 1:
+            self.allowed_formats = {"jpg", "jpeg", "png", "webp", 'webm', 'mp4', 'mov'}
+        elif video_flag == 2:
+            self.allowed_formats = {'webm', 'mp4', 'mov'}
+
+        self.output_dir = join(self.base_dir, data_name)
+        if tags is None:
+            with open("tags.txt", "r") as file:
+                tags = [line.strip() for line in file.readlines()]
+        elif self.single_character:
+            self.character_name = tags[0]
+        self.tags_list = [self.tag_query(tag) for tag in tags]
+
+        # Ensure output directory exists
+        os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
+
+        # Initialize page number and collected_images
+        self.page_num = 1
+        self.last_page = 0
+        self.clear_pages_count = 0
+        self.clear_pages_limit = 3
+        self.interrupted = False
+        self.end_of_page = False
+        self.collected_images = []
+
+        # Journal records held until the metadata saved before them is committed, and the
+        # metadata store batch of the last saved post
+        self.held_records = []
+        self.metadata_batch = -1
+
+        # Post ID cursor of incremental runs, e.g. "a123" for posts after 123 or "b123" for posts before it
+        self.incremental = incremental
+        self.cursor = None
+        self.newest_id = None
+        self.oldest_id = None
+
+        # Listing and post pages are parsed with lxml, optionally only their relevant subtrees
+        self.selective_parse = selective_parse
+
+        # Chrome only loads what page_source needs
+        self.lean_browser = lean_browser
+
+        # Counters and latency histograms of every stage, summarized per tag and optionally served to Prometheus
+        self.metrics = Metrics(labels={"site": self.SITE})
+        if metrics_port is not None:
+            self.metrics.serve(metrics_port)
+
+        # Page loads and HTTP requests share per-host request budgets that adapt to errors and latency
+        self.rate_limiter = RateLimiter(rate=request_rate)
+
+        # Page loads wait for their target element instead of a fixed sleep
+        self.page_waiter = PageWaiter(timeout=page_timeout, rate_limiter=self.rate_limiter)
+
+        # Metadata goes to one JSON file per image or to a single SQLite database
+        self.metadata_store = None
+        if metadata_sink == "sqlite":
+            self.metadata_store = SqliteMetadataStore(join(self.base_dir, self.data_name, 'metadata.sqlite'))
+
+        # Hashed index of collected post IDs, optionally shared by every tag of data_name
+        self.dedup_across_tags = dedup_across_tags
+        self.seen = SeenIndex()
+        if self.dedup_across_tags:
+            self.seen.load_logs(join(self.base_dir, self.data_name))
+
+        # Pooled HTTP client shared by every request that does not go through the browser
+        self.http = HttpClient(timeout=timeout, chunk_size=chunk_size, rate_limiter=self.rate_limiter)
+
+        # Images already downloaded under another tag or in an earlier run are linked instead of downloaded again
+        self.content_store = None
+        if content_store:
+            self.content_store = ContentStore(join(self.base_dir, 'content_store'))
+
+        # Fetch stage: post pages are loaded and parsed ahead of the persist stage
+        self.browser_workers = browser_workers
+        self.queue_size = queue_size
+        self.fetch_stage = Stage("fetch", self.fetch_post, workers=browser_workers, queue_size=queue_size)
+
+        # Download stage: images are downloaded in the background while the next posts are crawled
+        self.download_pool = DownloadPool(client=self.http, workers=download_workers, queue_size=queue_size,
+                                          per_host=download_per_host, store=self.content_store,
+                                          metrics=self.metrics)
+
+        # The WebDriver is only started by the site scrapers that need it
+        self.driver = None
+        self.driver_pool = None
+        self.queued_download = (None, None)
+
+    def tag_query(self, tag):
+        """
+        Adds the site-specific filters to a tag query.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: The tag query sent to the site.
+        """
+        return tag
+
+    def listing_url(self, tag):
+        """
+        Builds the URL of the listing pages of a tag.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: URL with a {page_num} placeholder.
+        """
+        raise NotImplementedError
+
+    def discover(self):
+        """
+        Lists the posts of the current page.
+
+        Returns:
+            list: List of (post_url, listing) pairs, where listing is whatever the listing page tells
+            about the post, or None at the end of the results.
+        """
+        raise NotImplementedError
+
+    def prefilter(self, post_url, listing):
+        """
+        Checks a post against the filters before its page is loaded.
+
+        Args:
+            post_url (str): URL of the post.
+            listing: What the listing page tells about the post.
+
+        Returns:
+            bool: False if the post can be rejected from the listing alone, True otherwise.
+        """
+        return True
+
+    def fetch_post(self, post_url, listing):
+        """
+        Fetches a post and extracts its image and metadata, run by the workers of the fetch stage.
+
+        Args:
+            post_url (str): URL of the post.
+            listing: What the listing page tells about the post.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        raise NotImplementedError
+
+    def parse_post(self, driver, post_url):
+        """
+        Loads a post page and extracts its image and metadata.
+
+        Args:
+            driver (WebDriver): WebDriver to load the page in, None without a browser.
+            post_url (str): URL of the post to parse.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        raise NotImplementedError
+
+    def load_post(self, post_url):
+        """
+        Parses a post page on a browser of the pool, or on the scraper's own WebDriver or HTTP session.
+
+        Args:
+            post_url (str): URL of the post to parse.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        if self.driver_pool is not None:
+            return self.driver_pool.run(self.parse_post, post_url, tag=self.tag_name())
+        return self.parse_post(self.driver, post_url)
+
+    def initialize_webdriver(self):
+        """
+        Initializes the WebDriver, and the pool of post page browsers when more than one is used.
+        """
+        self.driver = self.create_webdriver()
+        if self.browser_workers > 1 and self.driver_pool is None:
+            self.driver_pool = WebDriverPool(self.create_webdriver, size=self.browser_workers, metrics=self.metrics)
+
+    def chrome_options(self):
+        """
+        Returns the options of the headless Chrome browsers.
+
+        Returns:
+            Options: Chrome options.
+        """
+        # Headless browser setup
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36")
+        chrome_options.add_argument("--log-level=3")
+        chrome_options.add_argument("--disable-logging")
+
+        # Skip everything the scraper does not read
+        if self.lean_browser:
+            apply_lean_options(chrome_options)
+        return chrome_options
+
+    def create_webdriver(self):
+        """
+        Creates a headless WebDriver.
+
+        Returns:
+            WebDriver: The new WebDriver.
+        """
+        driver = webdriver.Chrome(options=self.chrome_options())
+        if self.lean_browser:
+            block_resources(driver)
+        return driver
+
+    @contextmanager
+    def timed_load(self, page):
+        """
+        Times a page load in a with block into page_load_seconds of the current tag. The time
+        the thread waited for the rate limiter goes to rate_limit_wait_seconds instead.
+
+        Args:
+            page (str): Kind of page, "listing" or "post".
+        """
+        waited = self.rate_limiter.waited()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wait = self.rate_limiter.waited() - waited
+            tag = self.tag_name()
+            self.metrics.observe("page_load_seconds", time.perf_counter() - start - wait, tag=tag, page=page)
+            self.metrics.observe("rate_limit_wait_seconds", wait, tag=tag, page=page)
+
+    def scrape_page(self, max_images):
+        """
+        Scrapes a page for images and metadata.
+
+        Args:
+            max_images (int): Maximum number of images to scrape.
+        """
+        header = f" \"{self.tag_name()}\" page {self.cursor or self.page_num} "
+        print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
+
+        # Discover
+        entries = self.discover()
+        tag = self.tag_name()
+        self.metrics.inc("pages_total", tag=tag)
+        if entries is None:
+            if self.cursor is not None and self.cursor.startswith("a"):
+                # No newer posts left, continue below the oldest collected one
+                self.cursor = f"b{self.oldest_id}"
+            else:
+                self.end_of_page = True
+            return
+
+        # Prefilter, posts already collected are never fetched
+        candidates = [(post_url, listing) for post_url, listing in entries
+                      if post_url not in self.seen and self.prefilter(post_url, listing)]
+        skipped = sum(1 for post_url, _ in entries if post_url not in self.seen) - len(candidates)
+        if skipped:
+            print(f"- Skipped {skipped} posts from the listing")
+        clear_count = len(entries) - len(candidates)
+        self.metrics.inc("posts_total", clear_count - skipped, tag=tag, result="seen")
+        self.metrics.inc("posts_total", skipped, tag=tag, result="prefiltered")
+
+        # Fetch, then download and persist in listing order
+        posts = self.fetch_stage.map(candidates)
+        try:
+            for (post_url, _), post in posts:
+                # Another tag worker may have collected the post in the meantime
+                if post is None or post_url in self.seen:
+                    clear_count += 1
+                    self.metrics.inc("posts_total", tag=tag, result="rejected" if post is None else "duplicate")
+                    continue
+                self.persist_post(post_url, post, max_images)
+                self.metrics.inc("posts_total", tag=tag, result="accepted")
+                if len(self.collected_images) >= max_images:
+                    return  # Stop scraping if the desired number of images is reached
+        finally:
+            posts.close()
+
+        if self.incremental:
+            self.advance_cursor([post_url for post_url, _ in entries])
+            return
+        if clear_count == len(entries):
+            self.clear_pages_count += 1
+        else:
+            self.clear_pages_count = 0
+            if self.page_num > self.last_page:
+                self.last_page = self.page_num
+                self.record_progress(functools.partial(self.journal.record_page, self.last_page))
+                print(f"\n{'*'*100}")
+                print(f"\nNew last page: {self.last_page}")
+        if self.clear_pages_count == self.clear_pages_limit:
+            header = f" Jumping to page {self.last_page} "
+            print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
+            self.page_num = self.last_page-1
+
+    def persist_post(self, post_url, post, max_images):
+        """
+        Queues the image of a fetched post for download and records it as collected.
+
+        Args:
+            post_url (str): URL of the post.
+            post (tuple): The image URL, image extension and metadata returned by fetch_post().
+            max_images (int): Maximum number of images to scrape.
+        """
+        print(f"\n- Processing: {post_url}")
+        self.save_post(*post)
+        self.collected_images.append(post_url)
+        self.seen.add(post_url)
+        # Save progress to the journal
+        self.record_progress(functools.partial(self.journal.append, post_url, self.last_page,
+                                               self.collected_images, *self.queued_download))
+        print(f"- Collected {len(self.collected_images)}/{max_images}")
+
+    def record_progress(self, write):
+        """
+        Writes a record to the progress journal once the metadata saved before it is committed,
+        so a killed run never skips a post the metadata store has no row for.
+
+        Args:
+            write (callable): Writes the record to the journal.
+        """
+        self.held_records.append(write)
+        # Any commit after the last save, also one by another tag scheduler worker, covers every held record
+        if self.metadata_store is None or self.metadata_store.committed(self.metadata_batch):
+            self.flush_progress()
+
+    def flush_progress(self):
+        """
+        Writes the held journal records, once their metadata batch was committed.
+        """
+        for write in self.held_records:
+            write()
+        self.held_records = []
+
+    def advance_cursor(self, post_urls):
+        """
+        Moves the post ID cursor past the posts of the current page.
+
+        Args:
+            post_urls (list): URLs of the posts listed on the current page.
+        """
+        ids = [int(post_id) for post_id in map(SeenIndex.post_id, post_urls) if post_id.isdigit()]
+        if not ids:
+            return
+        if self.cursor is not None and self.cursor.startswith("a"):
+            self.newest_id = max(ids)
+            self.cursor = f"a{self.newest_id}"
+        else:
+            self.newest_id = max(self.newest_id or 0, max(ids))
+            self.oldest_id = min(ids)
+            self.cursor = f"b{self.oldest_id}"
+
+    def save_post(self, image_url, image_extension, metadata):
+        """
+        Downloads the image of a post and saves its metadata under the next file number.
+
+        Args:
+            image_url (str): URL of the image to download.
+            image_extension (str): Extension of the image file.
+            metadata (dict): Metadata to save.
+        """
+        new_filename = f"{self.cur_tag.split('+')[0]}_{(5-len(str(len(self.collected_images)+1)))*'0'}{len(self.collected_images)+1}"
+        # Download the image
+        self.download_image(image_url, f"{new_filename}.{image_extension}")
+        self.queued_download = (image_url, f"{new_filename}.{image_extension}")
+
+        # Save metadata as JSON
+        self.save_metadata(f"{new_filename}.{image_extension}", metadata)
+
+    def download_image(self, image_url, image_name):
+        """
+        Queues an image from the specified URL on the download pool.
+
+        Args:
+            image_url (str): URL of the image to download.
+            image_name (str): Name to save the downloaded image as.
+        """
+        image_path = os.path.join(self.output_dir, image_name)
+        self.download_pool.submit(image_url, image_path, tag=self.tag_name())
+        print(f"- Image queued: {image_name}")
+
+    def save_metadata(self, image_name, metadata):
+        """
+        Saves metadata as a JSON file or into the SQLite metadata store.
+
+        Args:
+            image_name (str): Name of the image file.
+            metadata (dict): Metadata to save.
+        """
+        if self.metadata_store is not None:
+            with self.timed("metadata_write_seconds"):
+                self.metadata_batch = self.metadata_store.save(self.SITE, self.data_name, self.tag_name(),
+                                                               image_name, metadata)
+            print(f"- Metadata saved: {image_name}")
+            return
+
+        json_name = os.path.splitext(image_name)[0] + ".json"
+        json_path = os.path.join(self.output_dir, self.METADATA_DIR, json_name)
+        with self.timed("metadata_write_seconds"):
+            with open(json_path, 'w') as f:
+                json.dump(metadata, f, indent=4)
+        print(f"- Metadata saved: {json_name}")
+
+    def begin_tag(self, tag):
+        """
+        Sets up the output directory, progress journal and page cursor of a tag,
+        resuming from its log if one is found.
+
+        Args:
+            tag (str): URL-encoded tag query.
+        """
+        self.cur_tag = tag
+        if len(self.tags_list) > 1:
+            self.output_dir = join(self.base_dir, self.data_name, self.cur_tag)
+        else:
+            self.output_dir = join(self.base_dir, self.data_name)
+        os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
+        self.page_num = 1
+        self.clear_pages_count = 0
+        self.end_of_page = False
+        self.tag_started = time.time()
+        self.held_records = []
+        self.metadata_batch = -1
+
+        self.search_url = self.listing_url(tag)
+        self.journal = ProgressJournal(self.output_dir)
+        header = f" \"{self.tag_name()}\" "
+        print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
+        if self.journal.exists():
+            self.collected_images, self.last_page = self.journal.load()
+            print("\n-- Log file found")
+            print(f"-- Log last page: {self.last_page}")
+        else:
+            self.collected_images = []
+            self.last_page = 0
+        if self.dedup_across_tags:
+            self.seen.update(self.collected_images)
+        else:
+            self.seen = SeenIndex(self.collected_images)
+
+        # Incremental runs first list the posts newer than the newest collected one, then the ones
+        # older than the oldest, instead of walking the pages already seen
+        self.cursor = None
+        self.newest_id = None
+        self.oldest_id = None
+        if self.incremental:
+            ids = [int(post_id) for post_id in map(SeenIndex.post_id, self.collected_images) if post_id.isdigit()]
+            if ids:
+                self.newest_id, self.oldest_id = max(ids), min(ids)
+                self.cursor = f"a{self.newest_id}"
+                print(f"-- Post ID cursor: newer than {self.newest_id}, then older than {self.oldest_id}")
+
+        # Downloads interrupted in an earlier run are resumed from their part files
+        for image_name, image_url in self.journal.pending_downloads().items():
+            self.download_image(image_url, image_name)
+
+    def scrape_next_page(self, max_images):
+        """
+        Scrapes the current page of the tag and moves to the next one, restarting the
+        WebDriver if the page timed out or failed to load.
+
+        Args:
+            max_images (int): Maximum number of images to scrape.
+
+        Returns:
+            bool: True if the page was scraped, False if it timed out or failed to load.
+        """
+        try:
+            self.scrape_page(max_images)
+            self.page_num += 1
+            return True
+        except (selenium.common.exceptions.TimeoutException, TimeoutError):
+            print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
+            self.restart_webdriver()
+        except requests.exceptions.RequestException as e:
+            # Errors left after the client's retries, the page is loaded again on the next call
+            print(f"Request failed on page {self.page_num} ({e.__class__.__name__}). Restarting WebDriver.")
+            self.restart_webdriver()
+        return False
+
+    def tag_done(self, max_images):
+        """
+        Checks whether the current tag is finished.
+
+        Args:
+            max_images (int): Maximum number of images to scrape.
+
+        Returns:
+            bool: True if enough images were collected or the results ran out.
+        """
+        return len(self.collected_images) >= max_images or self.end_of_page
+
+    def finish_tag(self, compact=True):
+        """
+        Waits for the downloads of the current tag and closes its progress journal.
+
+        Args:
+            compact (bool, optional): Whether the journal is folded into the log snapshot first. Defaults to True.
+        """
+        self.download_pool.flush()
+        if self.metadata_store is not None:
+            self.metadata_store.commit()
+        self.flush_progress()
+        print(f"\n-- Scraping complete for tag \"{self.cur_tag.split('+')[0]}\"")
+        print(f"-- Total images collected: {len(self.collected_images)}")
+        print(f"-- Last page: {self.cursor or self.page_num-1}")
+        self.page_waiter.print_summary()
+        self.fetch_stage.print_summary()
+        self.save_metrics_summary()
+        if compact:
+            # Incremental runs do not move the page number the next page-based run jumps to
+            self.journal.compact(self.collected_images, self.last_page if self.incremental else self.page_num-1)
+        self.journal.close()
+
+    def save_metrics_summary(self):
+        """
+        Appends the counters and latency histograms of the current tag to metrics.jsonl in its output directory,
+        one line per run, so the summary is not read back as the metadata of a post.
+        """
+        tag = self.tag_name()
+        elapsed = time.time() - self.tag_started
+        summary = self.metrics.summary(tag=tag)
+        accepted = summary["counters"].get("posts_total", {}).get("result=accepted", 0)
+        summary = {"site": self.SITE,
+                   "tag": tag,
+                   "elapsed_seconds": elapsed,
+                   "posts_per_second": accepted / elapsed if elapsed > 0 else 0.0,
+                   **summary}
+        summary_path = join(self.output_dir, 'metrics.jsonl')
+        with open(summary_path, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        print(f"-- Metrics: {accepted} posts accepted, {summary['posts_per_second']:.2f} posts/sec, saved to {summary_path}")
+
+    def save_tag_state(self):
+        """
+        Returns the per-tag state of the scraper, so another tag can be scraped in between.
+
+        Returns:
+            dict: Values of TAG_STATE_FIELDS.
+        """
+        return {field: getattr(self, field) for field in self.TAG_STATE_FIELDS}
+
+    def load_tag_state(self, state):
+        """
+        Restores a per-tag state returned by save_tag_state().
+
+        Args:
+            state (dict): Values of TAG_STATE_FIELDS.
+        """
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    def scrape_pages(self, pages=5):
+        """
+        Scrapes a fixed number of pages of every tag.
+
+        Args:
+            pages (int, optional): Number of pages to scrape. Defaults to 5.
+        """
+        for tag in self.tags_list:
+            self.begin_tag(tag)
+            print(f"\n{'*'*100}")
+
+            while self.page_num <= pages and not self.end_of_page:
+                try:
+                    if self.scrape_next_page(max_images=float('inf')):
+                        print(f"\n{'*'*100}")
+                except KeyboardInterrupt:
+                    self.interrupted = True
+                    break
+
+            self.finish_tag(compact=False)
+            if self.interrupted: break
+        print(f"\n{'='*100}")
+
+    def scrape_limited_by_images(self, max_images=10):
+        """
+        Scrapes every tag with a limit on the number of images.
+
+        Args:
+            max_images (int, optional): Maximum number of images to scrape per tag. Defaults to 10.
+        """
+        for tag in self.tags_list:
+            self.begin_tag(tag)
+
+            while not self.tag_done(max_images):
+                try:
+                    self.scrape_next_page(max_images)
+                except KeyboardInterrupt:
+                    self.interrupted = True
+                    break
+
+            self.finish_tag()
+            if self.interrupted: break
+        print(f"\n{'='*100}")
+
+    def scrape(self, max_images=10, tag_workers=1):
+        """
+        Scrapes every tag with a limit on the number of images, one tag after the other
+        or several at once.
+
+        Args:
+            max_images (int, optional): Maximum number of images to scrape per tag. Defaults to 10.
+            tag_workers (int, optional): Number of tags scraped in parallel, each with its own browser. Defaults to 1.
+        """
+        if tag_workers > 1:
+            scheduler = TagScheduler(self, workers=tag_workers)
+            scheduler.run(max_images=max_images)
+            scheduler.close()
+        else:
+            self.scrape_limited_by_images(max_images=max_images)
+
+    def restart_webdriver(self):
+        """
+        Restarts the listing WebDriver, post page browsers are restarted by the pool.
+        """
+        if self.driver is None:
+            return
+        self.metrics.inc("driver_restarts_total", tag=self.tag_name(), driver="listing")
+        # Close the current WebDriver
+        self.driver.quit()
+        # Reinitialize the WebDriver
+        self.initialize_webdriver()
+
+    def fork(self):
+        """
+        Creates a scraper for another worker of the tag scheduler. It shares the HTTP client,
+        metadata store, seen index, per-host download limits and metrics with this one, and has its
+        own stage workers, browsers and load time recording.
+
+        Returns:
+            BooruScraper: The new scraper.
+        """
+        scraper = copy.copy(self)
+        scraper.page_waiter = PageWaiter(timeout=self.page_waiter.timeout, rate_limiter=self.rate_limiter)
+        scraper.fetch_stage = Stage("fetch", scraper.fetch_post, workers=len(self.fetch_stage.threads),
+                                    queue_size=self.queue_size)
+        scraper.download_pool = DownloadPool(client=self.http, workers=len(self.download_pool.threads),
+                                             queue_size=self.queue_size, host_slots=self.download_pool.host_slots,
+                                             store=self.content_store, metrics=self.metrics)
+        scraper.driver = None
+        scraper.driver_pool = None
+        if self.driver is not None:
+            scraper.initialize_webdriver()
+        return scraper
+
+    def close_workers(self):
+        """
+        Finishes the pending downloads and closes the stage workers and browsers.
+        """
+        self.download_pool.close()
+        self.fetch_stage.close()
+        if self.driver is not None:
+            self.driver.quit()
+        if self.driver_pool is not None:
+            self.driver_pool.close()
+
+    def close(self):
+        """
+        Closes the WebDriver after the pending downloads are finished.
+        """
+        self.close_workers()
+        self.http.close()
+        self.metrics.close()
+        if self.metadata_store is not None:
+            self.metadata_store.close()
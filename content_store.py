@@ -0,0 +1,134 @@
+import os
+import re
+import shutil
+import hashlib
+import urllib.parse
+
+# Danbooru and Sankaku name their files after the md5 of the content
+MD5_NAME = re.compile(r"(?:^|/)([0-9a-f]{32})\.\w+$")
+
+
+class ContentStore:
+    """
+    A content-addressed store of downloaded images keyed by md5. Every image is kept once under
+    objects/, and the files in the tag directories are hardlinks to it.
+    """
+    def __init__(self, root):
+        """
+        Initializes the ContentStore.
+
+        Args:
+            root (str): Directory of the store, it should be on the same filesystem as the tag directories.
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def key(self, url):
+        """
+        Returns the md5 embedded in the file name of a URL.
+
+        Args:
+            url (str): URL of the image.
+
+        Returns:
+            str: The md5, or None if the file name is not an md5.
+        """
+        match = MD5_NAME.search(urllib.parse.urlsplit(url).path.lower())
+        return match.group(1) if match else None
+
+    def object_path(self, digest, path):
+        """
+        Returns where the content with a given md5 is stored.
+
+        Args:
+            digest (str): md5 of the content.
+            path (str): Path of the image in its tag directory, used for the extension.
+
+        Returns:
+            str: Path of the object.
+        """
+        return os.path.join(self.objects_dir, digest[:2], digest + os.path.splitext(path)[1].lower())
+
+    def link(self, digest, path):
+        """
+        Places a stored image at a path.
+
+        Args:
+            digest (str): md5 of the image.
+            path (str): Path to place the image at.
+
+        Returns:
+            bool: True if the image was in the store, False otherwise.
+        """
+        object_path = self.object_path(digest, path)
+        if not os.path.exists(object_path):
+            return False
+        place(object_path, path)
+        return True
+
+    def add(self, path, digest, expected=None):
+        """
+        Adds a downloaded image to the store, or replaces it with a link if the store already has it.
+
+        Args:
+            path (str): Path of the downloaded image.
+            digest (str): md5 of the downloaded image.
+            expected (str, optional): md5 the image should have. Defaults to None.
+
+        Returns:
+            bool: True if the image was stored, False if it did not match the expected md5 and was deleted.
+        """
+        if expected is not None and digest != expected:
+            print(f"- Checksum mismatch: {os.path.basename(path)} (expected {expected}, got {digest})")
+            os.remove(path)
+            return False
+        object_path = self.object_path(digest, path)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            os.link(path, object_path)
+        except FileExistsError:
+            # Downloaded by another worker in the meantime, keep a single copy
+            place(object_path, path)
+        except OSError:
+            shutil.copy2(path, object_path)
+        return True
+
+    def fetch(self, client, url, path):
+        """
+        Places an image at a path, from the store if it has it, otherwise by downloading it.
+
+        Args:
+            client (HttpClient): HTTP client to download with.
+            url (str): URL of the image.
+            path (str): Path to save the image to.
+
+        Returns:
+            str: "linked" or "downloaded", or None if the image could not be fetched.
+        """
+        expected = self.key(url)
+        if expected is not None and self.link(expected, path):
+            return "linked"
+        digest = hashlib.md5()
+        if client.download(url, path, digest=digest) is None:
+            return None
+        return "downloaded" if self.add(path, digest.hexdigest(), expected) else None
+
+
+def place(object_path, path):
+    """
+    Atomically replaces a path with a hardlink to a stored image, or a copy across filesystems.
+
+    Args:
+        object_path (str): Path of the stored image.
+        path (str): Path to place the image at.
+    """
+    tmp_path = path + ".link"
+    try:
+        os.link(object_path, tmp_path)
+    except FileExistsError:
+        os.remove(tmp_path)
+        os.link(object_path, tmp_path)
+    except OSError:
+        shutil.copy2(object_path, tmp_path)
+    os.replace(tmp_path, path)
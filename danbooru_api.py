@@ -0,0 +1,133 @@
+from http_client import HttpClient
+from rate_limiter import is_challenge
+
+
+class DanbooruApiBackend:
+    """
+    Fetches Danbooru listings through the JSON API instead of a browser.
+    """
+    # Danbooru stores ratings as single letters in the API
+    RATING_NAMES = {
+        'g': 'General',
+        's': 'Sensitive',
+        'q': 'Questionable',
+        'e': 'Explicit'
+    }
+
+    def __init__(self,
+                 base_url="https://danbooru.donmai.us",
+                 client=None,
+                 limit=20):
+        """
+        Initializes the DanbooruApiBackend with the given parameters.
+
+        Args:
+            base_url (str, optional): Base URL for Danbooru. Defaults to "https://danbooru.donmai.us".
+            client (HttpClient, optional): Shared HTTP client. Defaults to a new HttpClient.
+            limit (int, optional): Number of posts requested per listing page. Defaults to 20.
+        """
+        self.base_url = base_url
+        # Page numbers are shared with the HTML listing and the log, so a page must hold as many
+        # posts as a page of the site
+        self.limit = limit
+
+        # The pooled client keeps the TLS connection alive between listing pages
+        self.client = client if client is not None else HttpClient()
+
+    def fetch_posts(self, tag, page_num):
+        """
+        Fetches one listing page of posts as JSON. Connection errors, 429 and 5xx are retried
+        by the client.
+
+        Args:
+            tag (str): URL-encoded tag query.
+            page_num (int): Page number to fetch.
+
+        Returns:
+            list: List of post dicts, or None if the API refused the request.
+
+        Raises:
+            requests.exceptions.RequestException: If the request still failed after the retries.
+        """
+        url = f"{self.base_url}/posts.json?tags={tag}&page={page_num}&limit={self.limit}"
+        response = self.client.get(url)
+        # Refusals and challenges switch the scraper to the browser, other errors fail the page
+        if response.status_code in (401, 403, 404) or is_challenge(response.status_code, response.headers):
+            print(f"- API returned status {response.status_code}")
+            return None
+        response.raise_for_status()
+        try:
+            posts = response.json()
+        except ValueError:
+            # Challenge pages come back as HTML
+            return None
+        return posts if isinstance(posts, list) else None
+
+    def post_url(self, post, tag):
+        """
+        Builds the post page URL in the same form the listing page links to.
+
+        Args:
+            post (dict): Post returned by the API.
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: URL of the post page.
+        """
+        return f"{self.base_url}/posts/{post['id']}?q={tag}"
+
+    def image_url(self, post, full_image):
+        """
+        Returns the file URL of a post.
+
+        Args:
+            post (dict): Post returned by the API.
+            full_image (bool): Whether to return the original instead of the sample.
+
+        Returns:
+            str: Image URL, or None if the file is not visible.
+        """
+        if full_image:
+            return post.get("file_url")
+        return post.get("large_file_url") or post.get("file_url")
+
+    def build_metadata(self, post, post_url, image_url):
+        """
+        Builds the metadata dict in the same layout as the post page scraper.
+
+        Args:
+            post (dict): Post returned by the API.
+            post_url (str): URL of the post page.
+            image_url (str): URL of the image to download.
+
+        Returns:
+            dict: Metadata of the post.
+        """
+        return {
+            "post_id": str(post["id"]),
+            "rating": self.RATING_NAMES.get(post.get("rating")),
+            "danbooru_url": post_url,
+            "original_filename": image_url.split("/")[-1],
+            "source_url": post.get("source") or None,
+            "tags": {
+                "artist_tags": self.split_tags(post, "tag_string_artist"),
+                "copyright_tags": self.split_tags(post, "tag_string_copyright"),
+                "character_tags": self.split_tags(post, "tag_string_character"),
+                "general_tags": self.split_tags(post, "tag_string_general"),
+                "meta_tags": self.split_tags(post, "tag_string_meta")
+            },
+        }
+
+    def split_tags(self, post, field):
+        """
+        Splits a space separated tag string of a post.
+
+        Args:
+            post (dict): Post returned by the API.
+            field (str): Name of the tag string field.
+
+        Returns:
+            list: List of tags.
+        """
+        tag_string = post.get(field) or ""
+        return tag_string.split()
@@ -0,0 +1,70 @@
+class DanbooruFilters:
+    """
+    Mixin building the tag queries of Danbooru and filtering the posts of its JSON API, shared by
+    DanbooruScraper and AsyncDanbooruScraper. The class using it sets rating_to_scrape,
+    single_character, character_name, full_image, allowed_formats and api, and counts the
+    rejected posts with count_rejection().
+    """
+    def tag_query(self, tag):
+        """
+        Adds the site-specific filters to a tag query.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: The tag query sent to Danbooru.
+        """
+        if not self.single_character:
+            return tag + '+-holostars'
+        if self.rating_to_scrape is not None and len(self.rating_to_scrape) == 1:
+            return tag + f'+rating%3A{self.rating_to_scrape[0]}'
+        return tag
+
+    def passes_filters(self, image_extension, rating, characters):
+        """
+        Checks a post against the format, rating and single character filters.
+
+        Args:
+            image_extension (str): Extension of the image file.
+            rating (str): Rating of the post.
+            characters (list): Character tags of the post.
+
+        Returns:
+            bool: True if the post should be collected, False otherwise.
+        """
+        if image_extension not in self.allowed_formats:
+            self.count_rejection("format")
+            return False
+        if self.rating_to_scrape is not None and (rating is None or rating.lower() not in self.rating_to_scrape):
+            self.count_rejection("rating")
+            return False
+        if self.single_character:
+            for character in characters:
+                if self.character_name not in character:
+                    self.count_rejection("character")
+                    return False
+        return True
+
+    def parse_api_post(self, post, post_url):
+        """
+        Extracts the image and metadata of a post returned by the JSON API without loading its page.
+
+        Args:
+            post (dict): Post returned by the API.
+            post_url (str): URL of the post page.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        image_url = self.api.image_url(post, self.full_image)
+        if not image_url:
+            self.count_rejection("no_image")
+            return None
+
+        metadata = self.api.build_metadata(post, post_url, image_url)
+        image_extension = metadata["original_filename"].split(".")[-1].lower()
+
+        if not self.passes_filters(image_extension, metadata["rating"], metadata["tags"]["character_tags"]):
+            return None
+        return image_url, image_extension, metadata
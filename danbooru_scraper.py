@@ -1,22 +1,18 @@
-import os
-from os import listdir
-from os.path import join
 import json
-import time
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import pickle as pkl
-import selenium
 import argparse
 from datetime import datetime
 import urllib.parse
+from booru_scraper import BooruScraper
+from danbooru_api import DanbooruApiBackend
+from danbooru_filters import DanbooruFilters
+from html_parsing import parse_html, LISTING_STRAINER, DANBOORU_POST_STRAINER
 
-class DanbooruScraper:
+class DanbooruScraper(DanbooruFilters, BooruScraper):
     """
     A scraper for Danbooru that collects images and metadata based on specified tags and ratings.
     """
+    SITE = "danbooru"
+
     def __init__(self, 
                  data_name, 
                  tags=None, 
@@ -25,6 +21,22 @@ class DanbooruScraper:
                  single_character=False,
                  base_dir = 'scraped_images',
                  video_flag = 0,
+                 backend="api",
+                 download_workers=4,
+                 download_per_host=None,
+                 chunk_size=1024 * 1024,
+                 timeout=60,
+                 dedup_across_tags=False,
+                 metadata_sink="json",
+                 page_timeout=10,
+                 browser_workers=1,
+                 queue_size=64,
+                 selective_parse=True,
+                 request_rate=2.0,
+                 content_store=False,
+                 lean_browser=True,
+                 incremental=False,
+                 metrics_port=None,
                  base_url="https://danbooru.donmai.us"):
         """
         Initializes the DanbooruScraper with the given parameters.
@@ -37,139 +49,185 @@ class DanbooruScraper:
             single_character (bool, optional): Whether to scrape only single character images. Defaults to False.
             base_dir (str, optional): Base directory for saving scraped images. Defaults to 'scraped_images'.
             video_flag (int, optional): Flag to include videos. Defaults to 0.
+            backend (str, optional): Fetch backend, "api" or "selenium". Defaults to "api".
+            download_workers (int, optional): Number of concurrent image downloads. Defaults to 4.
+            download_per_host (int, optional): Maximum number of concurrent image downloads from one host, across the tag workers. Defaults to download_workers.
+            chunk_size (int, optional): Size of the chunks written while downloading. Defaults to 1 MiB.
+            timeout (float, optional): HTTP request timeout in seconds. Defaults to 60.
+            dedup_across_tags (bool, optional): Whether a post collected under one tag is skipped under the others. Defaults to False.
+            metadata_sink (str, optional): Where metadata is written, "json" files or a "sqlite" database. Defaults to "json".
+            page_timeout (float, optional): Maximum number of seconds to wait for a page to be ready. Defaults to 10.
+            browser_workers (int, optional): Number of browsers loading post pages in parallel. Defaults to 1.
+            queue_size (int, optional): Maximum number of posts waiting in the fetch and download queues. Defaults to 64.
+            selective_parse (bool, optional): Whether only the subtrees read by the scraper are parsed. Defaults to True.
+            request_rate (float, optional): Initial number of requests per second sent to each host. Defaults to 2.0.
+            content_store (bool, optional): Whether images are kept once in a content-addressed store and hardlinked into the tag directories. Defaults to False.
+            lean_browser (bool, optional): Whether Chrome skips images, media, fonts, stylesheets and ads. Defaults to True.
+            incremental (bool, optional): Whether listings are paged by post ID from the collected posts instead of by page number. Defaults to False.
+            metrics_port (int, optional): Port of the Prometheus metrics endpoint, not served if None. Defaults to None.
             base_url (str, optional): Base URL for Danbooru. Defaults to "https://danbooru.donmai.us".
         """
-        self.base_url = base_url
-        self.data_name = data_name
-        self.rating_to_scrape = rating
-        self.full_image = full_image
-        self.single_character = single_character
-        self.base_dir = base_dir
-        
-        if video_flag == 0:
-            self.allowed_formats = {"jpg", "jpeg", "png", "webp"}
-        elif video_flag == 1:
-            self.allowed_formats = {"jpg", "jpeg", "png", "webp", 'webm', 'mp4', 'mov'}
-        elif video_flag == 2:
-            self.allowed_formats = {'webm', 'mp4', 'mov'}
-
-        self.output_dir = join(self.base_dir, data_name)
-        if tags is None:
-            with open("tags.txt", "r") as file:
-                self.tags_list = [line.strip() for line in file.readlines()]
-        elif self.single_character:
-            self.character_name = tags[0]
-            self.tags_list = tags
-        else:
-            self.tags_list = tags
-
-        if not self.single_character:
-            for i in range(len(self.tags_list)):
-                self.tags_list[i] = self.tags_list[i] + '+-holostars'
-        elif self.single_character and len(self.rating_to_scrape) == 1:
-            for i in range(len(self.tags_list)):
-                self.tags_list[i] = self.tags_list[i] + f'+rating%3A{self.rating_to_scrape[0]}'
-
-        # Ensure output directory exists
-        os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-
-        # Initialize page number and collected_images
-        self.page_num = 1
-        self.last_page = 0
-        self.clear_pages_count = 0
-        self.clear_pages_limit = 3
-        self.scrape = True
-        self.end_of_page = False
-        self.collected_images = []
-
-        # Initialize WebDriver
-        self.initialize_webdriver()
-
-    def initialize_webdriver(self):
+        super().__init__(data_name,
+                         tags=tags,
+                         rating=rating,
+                         full_image=full_image,
+                         single_character=single_character,
+                         base_dir=base_dir,
+                         video_flag=video_flag,
+                         download_workers=download_workers,
+                         download_per_host=download_per_host,
+                         chunk_size=chunk_size,
+                         timeout=timeout,
+                         dedup_across_tags=dedup_across_tags,
+                         metadata_sink=metadata_sink,
+                         page_timeout=page_timeout,
+                         browser_workers=browser_workers,
+                         queue_size=queue_size,
+                         selective_parse=selective_parse,
+                         request_rate=request_rate,
+                         content_store=content_store,
+                         lean_browser=lean_browser,
+                         incremental=incremental,
+                         metrics_port=metrics_port,
+                         base_url=base_url)
+
+        # Initialize the fetch backend, the WebDriver is only started when needed
+        self.backend = backend
+        self.api = DanbooruApiBackend(base_url=self.base_url, client=self.http)
+        if self.backend == "selenium":
+            self.initialize_webdriver()
+
+    def listing_url(self, tag):
+        """
+        Builds the URL of the listing pages of a tag.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: URL with a {page_num} placeholder.
         """
-        Initializes the WebDriver.
+        return f"{self.base_url}/posts?page={{page_num}}&tags={tag}"
+
+    def discover(self):
         """
-        # Headless browser setup
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36")
-        chrome_options.add_argument("--log-level=3")
-        chrome_options.add_argument("--disable-logging")
-
-        # Initialize the WebDriver
-        self.driver = webdriver.Chrome(options=chrome_options)
-
-    def scrape_page(self, max_images):
+        Lists the posts of the current page with the fetch backend.
+
+        Returns:
+            list: List of (post_url, listing) pairs, or None at the end of the results.
         """
-        Scrapes a page for images and metadata.
+        if self.backend == "api":
+            return self.list_posts_api()
+        return self.list_posts_selenium()
 
-        Args:
-            max_images (int): Maximum number of images to scrape.
+    def list_posts_api(self):
+        """
+        Lists the posts of the current page through the JSON API.
+
+        Returns:
+            list: List of (post_url, post) pairs, or None at the end of the results.
+        """
+        with self.timed_load("listing"):
+            posts = self.api.fetch_posts(self.cur_tag, self.cursor or self.page_num)
+        if posts is None:
+            print("- JSON API unavailable, falling back to Selenium")
+            self.backend = "selenium"
+            if self.driver is None:
+                self.initialize_webdriver()
+            return self.list_posts_selenium()
+
+        if not posts:
+            return None
+        return [(self.api.post_url(post, self.cur_tag), post) for post in posts]
+
+    def list_posts_selenium(self):
         """
-        url = self.search_url.format(page_num=self.page_num)
-        # header = f' Processing page {self.page_num}: {url} '
-        # print(f"\n{'*'*((100-(len(header)))//2)}{header}{'*'*((100-(len(header)))//2)}")
-        # print(f"\n-- {header}")
-        header = f" \"{urllib.parse.unquote(self.cur_tag.split('+')[0])}\" page {self.page_num} "
-        print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
-        self.driver.get(url)
-        time.sleep(2)  # Allow the page to load
-
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        Lists the posts of the current page by loading it in the WebDriver.
+
+        Returns:
+            list: List of (post_url, article) pairs, or None at the end of the results.
+        """
+        url = self.search_url.format(page_num=self.cursor or self.page_num)
+        with self.timed_load("listing"):
+            self.page_waiter.load(self.driver, url, "div.posts-container")
+
+        with self.timed("parse_seconds", page="listing"):
+            soup = parse_html(self.driver.page_source,
+                              LISTING_STRAINER if self.selective_parse else None,
+                              ("div.posts-container",))
         posts_container = soup.find("div", class_="posts-container")
 
         if posts_container is None:
-            self.end_of_page = True
-            return
-
-        if posts_container:
-            article_elements = posts_container.find_all("article")
-            clear_count = 0
-            for article in article_elements:
-                if len(self.collected_images) >= max_images:
-                    return  # Stop scraping if the desired number of images is reached
-                link = article.find("a", href=True)
-                if link:
-                    post_url = self.base_url + link['href']
-                    if post_url not in self.collected_images and self.process_post(post_url):
-                        self.collected_images.append(post_url)
-                        # Save progress to log file
-                        pkl.dump([self.collected_images, self.last_page], open(join(self.output_dir, 'log.pkl'), 'wb'))
-                        print(f"- Collected {len(self.collected_images)}/{max_images}")
-                    else:
-                        clear_count += 1
-            if clear_count == len(article_elements):
-                self.clear_pages_count += 1
-            else:
-                self.clear_pages_count = 0
-                if self.page_num > self.last_page:
-                    self.last_page = self.page_num
-                    print(f"\n{'*'*100}")
-                    print(f"\nNew last page: {self.last_page}")
-            if self.clear_pages_count == self.clear_pages_limit:
-                header = f" Jumping to page {self.last_page} "
-                print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
-                # print(f"\n{header}{'-'*(100-len(header))}")
-                # print(f'\nJumping to page {self.last_page}')
-                self.page_num = self.last_page-1
-
-    def process_post(self, post_url):
+            return None
+
+        entries = []
+        for article in posts_container.find_all("article"):
+            link = article.find("a", href=True)
+            if link:
+                entries.append((self.base_url + link['href'], article))
+        return entries
+
+    def prefilter(self, post_url, listing):
+        """
+        Checks a listing article against the format and rating filters before its post is opened.
+        Posts listed by the API are complete and filtered when fetched.
+
+        Args:
+            post_url (str): URL of the post.
+            listing (dict or Tag): Post returned by the API, or <article> element of the listing page.
+
+        Returns:
+            bool: False if the post can be rejected from the listing alone, True otherwise.
+        """
+        if isinstance(listing, dict):
+            return True
+
+        # The sample of a post can have a different extension than the original,
+        # so the format can only be decided from the listing when scraping full images
+        image_extension = listing.get("data-file-ext")
+        if self.full_image and image_extension and image_extension.lower() not in self.allowed_formats:
+            self.count_rejection("format")
+            return False
+
+        rating = DanbooruApiBackend.RATING_NAMES.get(listing.get("data-rating"))
+        if self.rating_to_scrape is not None and rating is not None and rating.lower() not in self.rating_to_scrape:
+            self.count_rejection("rating")
+            return False
+        return True
+
+    def fetch_post(self, post_url, listing):
         """
-        Processes a post to extract image and metadata.
+        Extracts the image and metadata of a post from the API, or from its page.
 
         Args:
-            post_url (str): URL of the post to process.
+            post_url (str): URL of the post.
+            listing (dict or Tag): Post returned by the API, or <article> element of the listing page.
 
         Returns:
-            bool: True if the post was processed successfully, False otherwise.
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
         """
-        self.driver.get(post_url)
-        time.sleep(2)
+        if isinstance(listing, dict):
+            return self.parse_api_post(listing, post_url)
+        return self.load_post(post_url)
 
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+    def parse_post(self, driver, post_url):
+        """
+        Loads a post page and extracts its image and metadata.
+
+        Args:
+            driver (WebDriver): WebDriver to load the page in.
+            post_url (str): URL of the post to parse.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        with self.timed_load("post"):
+            self.page_waiter.load(driver, post_url, "#image, #post-info-size")
+
+        with self.timed("parse_seconds", page="post"):
+            soup = parse_html(driver.page_source,
+                              DANBOORU_POST_STRAINER if self.selective_parse else None,
+                              ("#post-information", "#tag-list"))
         if not self.full_image:
            image = soup.select_one("#image")
         else:
@@ -191,19 +249,9 @@ class DanbooruScraper:
             source_url = self.extract_source_url(soup, "#post-info-source")
             characters = self.extract_tags(soup, "ul", "character-tag-list")
 
-            if image_extension not in self.allowed_formats or (self.rating_to_scrape is not None and rating.lower() not in self.rating_to_scrape):
+            if not self.passes_filters(image_extension, rating, characters):
                 # print(f"Skipping unsupported image format: {image_extension}")
-                return False
-            elif self.single_character:
-                for character in characters:
-                    if self.character_name not in character:
-                        return False
-            
-            print(f"\n- Processing: {post_url}")
-
-            new_filename = f"{self.cur_tag.split('+')[0]}_{(5-len(str(len(self.collected_images)+1)))*'0'}{len(self.collected_images)+1}"
-            # Download the image
-            self.download_image(image_url, f"{new_filename}.{image_extension}")
+                return None
 
             # Scrape the metadata
             metadata = {
@@ -221,10 +269,9 @@ class DanbooruScraper:
                 },
             }
 
-            # Save metadata as JSON
-            self.save_metadata(f"{new_filename}.{image_extension}", metadata)
-            return True
-        return False
+            return image_url, image_extension, metadata
+        self.count_rejection("no_image")
+        return None
 
     def extract_info(self, soup, selector):
         """
@@ -279,36 +326,6 @@ class DanbooruScraper:
             tag_list = [li["data-tag-name"] for li in tag_container.find_all("li") if "data-tag-name" in li.attrs]
         return tag_list
 
-    def download_image(self, image_url, image_name):
-        """
-        Downloads an image from the specified URL.
-
-        Args:
-            image_url (str): URL of the image to download.
-            image_name (str): Name to save the downloaded image as.
-        """
-        response = requests.get(image_url, stream=True)
-        if response.status_code == 200:
-            image_path = os.path.join(self.output_dir, image_name)
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            print(f"- Image saved: {image_name}")
-
-    def save_metadata(self, image_name, metadata):
-        """
-        Saves metadata as a JSON file.
-
-        Args:
-            image_name (str): Name of the image file.
-            metadata (dict): Metadata to save.
-        """
-        json_name = os.path.splitext(image_name)[0] + ".json"
-        json_path = os.path.join(self.output_dir, json_name)
-        with open(json_path, 'w') as f:
-            json.dump(metadata, f, indent=4)
-        print(f"- Metadata saved: {json_name}")
-
     def scrape_danbooru(self, pages=5):
         """
         Scrapes Danbooru for a fixed number of pages.
@@ -316,49 +333,7 @@ class DanbooruScraper:
         Args:
             pages (int, optional): Number of pages to scrape. Defaults to 5.
         """
-        for tag in self.tags_list:
-            self.cur_tag = tag
-            if len(self.tags_list) > 1:
-                self.output_dir = join(self.base_dir, self.data_name, self.cur_tag)
-            else:
-                self.output_dir = join(self.base_dir, self.data_name)
-            os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-            self.page_num = 1
-            self.clear_pages_count = 0
-            self.scrape = True
-            self.end_of_page = False
-
-            self.search_url = f"{self.base_url}/posts?page={{page_num}}&tags={tag}"
-            files = listdir(self.output_dir)
-            header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" "
-            print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
-            if 'log.pkl' in files:
-                self.collected_images, self.last_page = pkl.load(open(join(self.output_dir, 'log.pkl'), 'rb'))
-                print("\n-- Log file found")
-                print(f"-- Log last page: {self.last_page}")
-            else:
-                self.collected_images = []
-                self.page_num = 1
-
-            print(f"\n{'*'*100}")
-                
-            while self.page_num <= pages and not self.end_of_page:
-                try:
-                    self.scrape_page(max_images=float('inf'))
-                    self.page_num += 1
-                    print(f"\n{'*'*100}")
-                except selenium.common.exceptions.TimeoutException:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except KeyboardInterrupt:
-                    self.scrape = False
-                    break
-            
-            print(f"\n-- Scraping complete for tag \"{tag.split('+')[0]}\"")
-            print(f"-- Total images collected: {len(self.collected_images)}")
-            print(f"-- Last page: {self.page_num-1}")
-            if not self.scrape: break
-        print(f"\n{'='*100}")
+        self.scrape_pages(pages)
 
     def scrape_danbooru_limited_by_images(self, max_images=10):
         """
@@ -367,65 +342,7 @@ class DanbooruScraper:
         Args:
             max_images (int, optional): Maximum number of images to scrape. Defaults to 10.
         """
-        for tag in self.tags_list:
-            self.cur_tag = tag
-            if len(self.tags_list) > 1:
-                self.output_dir = join(self.base_dir, self.data_name, self.cur_tag)
-            else:
-                self.output_dir = join(self.base_dir, self.data_name)
-            os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-            self.page_num = 1
-            self.clear_pages_count = 0
-            self.scrape = True
-            self.end_of_page = False
-
-            self.search_url = f"{self.base_url}/posts?page={{page_num}}&tags={tag}"
-            files = listdir(self.output_dir)
-            header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" "
-            print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
-            if 'log.pkl' in files:
-                self.collected_images, self.last_page = pkl.load(open(join(self.output_dir, 'log.pkl'), 'rb'))
-                print("\n-- Log file found")
-                print(f"-- Log last page: {self.last_page}")
-            else:
-                self.collected_images = []
-                self.page_num = 1
-            
-            # print(f"\n{'*'*100}")
-
-            while len(self.collected_images) < max_images and not self.end_of_page:
-                try:
-                    self.scrape_page(max_images)
-                    self.page_num += 1
-                except selenium.common.exceptions.TimeoutException:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except KeyboardInterrupt:
-                    self.scrape = False
-                    break
-
-            print(f"\n-- Scraping complete for tag \"{tag.split('+')[0]}\"")
-            print(f"-- Total images collected: {len(self.collected_images)}")
-            print(f"-- Last page: {self.page_num-1}")
-            pkl.dump([self.collected_images, self.page_num-1], open(join(self.output_dir, 'log.pkl'), 'wb'))
-            if not self.scrape: break
-        print(f"\n{'='*100}")
-
-    def restart_webdriver(self):
-        """
-        Restarts the WebDriver.
-        """
-        # Close the current WebDriver
-        self.driver.quit()
-        time.sleep(5)  # Give some time before restarting
-        # Reinitialize the WebDriver
-        self.initialize_webdriver()
-
-    def close(self):
-        """
-        Closes the WebDriver.
-        """
-        self.driver.quit()
+        self.scrape_limited_by_images(max_images)
 
 
 if __name__ == "__main__":
@@ -500,6 +417,138 @@ if __name__ == "__main__":
         help="If set, download videos only (default: False)"
     )
 
+    # Number of concurrent image downloads
+    parser.add_argument(
+        "--download_workers", 
+        type=int, 
+        default=4, 
+        help="Number of concurrent image downloads (default: 4)"
+    )
+
+    # Concurrent image downloads from one host
+    parser.add_argument(
+        "--download_per_host", 
+        type=int, 
+        help="Maximum number of concurrent image downloads from one host (default: --download_workers)"
+    )
+
+    # Download chunk size in bytes
+    parser.add_argument(
+        "--chunk_size", 
+        type=int, 
+        default=1024 * 1024, 
+        help="Download chunk size in bytes (default: 1048576)"
+    )
+
+    # HTTP request timeout
+    parser.add_argument(
+        "--timeout", 
+        type=float, 
+        default=60, 
+        help="HTTP request timeout in seconds (default: 60)"
+    )
+
+    # Boolean flag for skipping posts already collected under another tag
+    parser.add_argument(
+        "--dedup_across_tags", 
+        action='store_true', 
+        help="If set, skip posts already collected under another tag (default: False)"
+    )
+
+    # Page load ceiling
+    parser.add_argument(
+        "--page_timeout", 
+        type=float, 
+        default=10, 
+        help="Maximum number of seconds to wait for a page to be ready (default: 10)"
+    )
+
+    # Number of browsers loading post pages
+    parser.add_argument(
+        "--browser_workers", 
+        type=int, 
+        default=1, 
+        help="Number of browsers loading post pages in parallel (default: 1)"
+    )
+
+    # Bound of the fetch and download queues
+    parser.add_argument(
+        "--queue_size", 
+        type=int, 
+        default=64, 
+        help="Maximum number of posts waiting in the fetch and download queues (default: 64)"
+    )
+
+    # Initial request rate per host
+    parser.add_argument(
+        "--request_rate", 
+        type=float, 
+        default=2.0, 
+        help="Initial number of requests per second sent to each host, adjusted while scraping (default: 2.0)"
+    )
+
+    # Boolean flag for post ID cursors
+    parser.add_argument(
+        "--incremental", 
+        action='store_true', 
+        help="If set, list only posts newer than the newest collected one, then older than the oldest (default: False)"
+    )
+
+    # Boolean flag for loading whole pages in Chrome
+    parser.add_argument(
+        "--full_browser", 
+        action='store_true', 
+        help="If set, let Chrome load images, stylesheets, fonts and ads (default: False)"
+    )
+
+    # Boolean flag for the content-addressed image store
+    parser.add_argument(
+        "--content_store", 
+        action='store_true', 
+        help="If set, keep every image once in a content-addressed store and hardlink it into the tag directories (default: False)"
+    )
+
+    # Number of tags scraped at the same time
+    parser.add_argument(
+        "--tag_workers", 
+        type=int, 
+        default=1, 
+        help="Number of tags scraped in parallel, each with its own browser (default: 1)"
+    )
+
+    # Boolean flag for parsing whole pages
+    parser.add_argument(
+        "--full_parse", 
+        action='store_true', 
+        help="If set, parse whole pages instead of only the relevant subtrees (default: False)"
+    )
+
+    # Metadata sink
+    parser.add_argument(
+        "--metadata_sink", 
+        type=str, 
+        choices=["json", "sqlite"],
+        default="json", 
+        help="Write metadata as JSON files or into one SQLite database (default: json)"
+    )
+
+    # Fetch backend, Selenium is kept as a fallback for the JSON API
+    parser.add_argument(
+        "--backend", 
+        type=str, 
+        choices=["api", "selenium"],
+        default="api", 
+        help="Fetch backend to use (default: api)"
+    )
+
+    # Port of the Prometheus metrics endpoint
+    parser.add_argument(
+        "--metrics_port", 
+        type=int, 
+        default=None, 
+        help="Serve counters and latency histograms for Prometheus on this port (default: None)"
+    )
+
     args = parser.parse_args()
 
     # Extract arguments from command-line
@@ -548,10 +597,26 @@ if __name__ == "__main__":
                               full_image = full_image, 
                               single_character = single_character,
                               base_dir = base_dir,
-                              video_flag = video_flag)
+                              video_flag = video_flag,
+                              backend = args.backend,
+                              download_workers = args.download_workers,
+                              download_per_host = args.download_per_host,
+                              chunk_size = args.chunk_size,
+                              timeout = args.timeout,
+                              dedup_across_tags = args.dedup_across_tags,
+                              metadata_sink = args.metadata_sink,
+                              page_timeout = args.page_timeout,
+                              browser_workers = args.browser_workers,
+                              queue_size = args.queue_size,
+                              selective_parse = not args.full_parse,
+                              request_rate = args.request_rate,
+                              lean_browser = not args.full_browser,
+                              content_store = args.content_store,
+                              incremental = args.incremental,
+                              metrics_port = args.metrics_port)
     
     # Scrape with a limit on the number of images for each tag
-    scraper.scrape_danbooru_limited_by_images(max_images=max_img)  # Adjust max_images as needed
+    scraper.scrape(max_images=max_img, tag_workers=args.tag_workers)  # Adjust max_images as needed
     
     # Alternatively, scrape a fixed number of pages for each tag
     # scraper.scrape_danbooru(pages=5)  # Adjust the number of pages to scrape as needed
@@ -0,0 +1,68 @@
+import os
+import urllib.parse
+from progress_journal import ProgressJournal
+
+
+class SeenIndex:
+    """
+    A hashed set of collected post IDs used instead of scanning the collected_images list.
+    """
+    def __init__(self, post_urls=()):
+        """
+        Initializes the SeenIndex with the given post URLs.
+
+        Args:
+            post_urls (iterable, optional): Post URLs already collected. Defaults to ().
+        """
+        self.ids = set()
+        self.update(post_urls)
+
+    @staticmethod
+    def post_id(post_url):
+        """
+        Extracts the post ID from a post URL.
+
+        Args:
+            post_url (str): URL of the post.
+
+        Returns:
+            str: The post ID, which is the last segment of the URL path.
+        """
+        path = urllib.parse.urlsplit(post_url).path.rstrip('/')
+        return path.split('/')[-1]
+
+    def add(self, post_url):
+        """
+        Marks a post as seen.
+
+        Args:
+            post_url (str): URL of the post.
+        """
+        self.ids.add(self.post_id(post_url))
+
+    def update(self, post_urls):
+        """
+        Marks several posts as seen.
+
+        Args:
+            post_urls (iterable): URLs of the posts.
+        """
+        self.ids.update(self.post_id(post_url) for post_url in post_urls)
+
+    def load_logs(self, directory):
+        """
+        Marks every post recorded in the progress logs under a directory as seen.
+
+        Args:
+            directory (str): Directory to search for log files.
+        """
+        for root, _, files in os.walk(directory):
+            if 'log.pkl' in files or 'log.jsonl' in files:
+                collected_images, _ = ProgressJournal(root).load()
+                self.update(collected_images)
+
+    def __contains__(self, post_url):
+        return self.post_id(post_url) in self.ids
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,166 @@
+import os
+import queue
+import time
+import threading
+import urllib.parse
+from http_client import HttpClient
+
+
+class HostSlots:
+    """
+    Semaphores limiting the concurrent downloads from each host, shared by every pool that downloads from it.
+    """
+    def __init__(self, per_host):
+        """
+        Initializes the HostSlots.
+
+        Args:
+            per_host (int): Maximum number of concurrent downloads per host.
+        """
+        self.per_host = per_host
+        self.slots = {}
+        self.lock = threading.Lock()
+
+    def get(self, image_url):
+        """
+        Returns the semaphore limiting concurrent downloads from the host of a URL.
+
+        Args:
+            image_url (str): URL of the image to download.
+
+        Returns:
+            threading.BoundedSemaphore: Semaphore of the host.
+        """
+        host = urllib.parse.urlsplit(image_url).netloc
+        with self.lock:
+            if host not in self.slots:
+                self.slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.slots[host]
+
+
+class DownloadPool:
+    """
+    A bounded pool of download workers that takes (url, path) jobs from the crawler through a queue.
+    """
+    def __init__(self,
+                 client=None,
+                 workers=4,
+                 queue_size=64,
+                 per_host=None,
+                 host_slots=None,
+                 store=None,
+                 metrics=None):
+        """
+        Initializes the DownloadPool and starts its worker threads.
+
+        Args:
+            client (HttpClient, optional): Shared HTTP client. Defaults to a new HttpClient.
+            workers (int, optional): Number of download threads. Defaults to 4.
+            queue_size (int, optional): Maximum number of pending jobs before submit() blocks. Defaults to 64.
+            per_host (int, optional): Maximum number of concurrent downloads per host. Defaults to workers.
+            host_slots (HostSlots, optional): Per-host limits shared with other pools, per_host is ignored if set. Defaults to None.
+            store (ContentStore, optional): Content-addressed store images are looked up in and added to. Defaults to None.
+            metrics (Metrics, optional): Registry the download results, bytes and latencies are recorded in. Defaults to None.
+        """
+        self.client = client if client is not None else HttpClient()
+        self.host_slots = host_slots if host_slots is not None else HostSlots(per_host or workers)
+        self.store = store
+        self.metrics = metrics
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+        self.threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, image_url, image_path, tag=None):
+        """
+        Queues a download, blocking while the queue is full.
+
+        Args:
+            image_url (str): URL of the image to download.
+            image_path (str): Path to save the downloaded image to.
+            tag (str, optional): Tag the download is recorded under in the metrics. Defaults to None.
+        """
+        if self.closed:
+            raise RuntimeError("DownloadPool is closed")
+        self.jobs.put((image_url, image_path, tag))
+
+    def worker(self):
+        """
+        Runs downloads from the queue until a stop marker is received.
+        """
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                image_url, image_path, tag = job
+                with self.host_slots.get(image_url):
+                    self.download(image_url, image_path, tag)
+            except Exception as e:
+                print(f"- Download failed: {job[0]} ({e})")
+                self.record(job[2], None)
+            finally:
+                self.jobs.task_done()
+
+    def download(self, image_url, image_path, tag=None):
+        """
+        Downloads an image from the specified URL.
+
+        Args:
+            image_url (str): URL of the image to download.
+            image_path (str): Path to save the downloaded image to.
+            tag (str, optional): Tag the download is recorded under in the metrics. Defaults to None.
+        """
+        start = time.perf_counter()
+        if self.store is not None:
+            result = self.store.fetch(self.client, image_url, image_path)
+            if result == "linked":
+                print(f"- Image linked from the content store: {os.path.basename(image_path)}")
+            elif result == "downloaded":
+                print(f"- Image saved: {os.path.basename(image_path)}")
+        else:
+            result = "downloaded" if self.client.download(image_url, image_path) is not None else None
+            if result == "downloaded":
+                print(f"- Image saved: {os.path.basename(image_path)}")
+        self.record(tag, result, time.perf_counter() - start, image_path)
+
+    def record(self, tag, result, seconds=None, image_path=None):
+        """
+        Records the result of a download in the metrics.
+
+        Args:
+            tag (str): Tag of the download.
+            result (str): "downloaded", "linked", or None if the download failed.
+            seconds (float, optional): Duration of the download. Defaults to None.
+            image_path (str, optional): Path of the saved image. Defaults to None.
+        """
+        if self.metrics is None:
+            return
+        self.metrics.inc("downloads_total", tag=tag, result=result or "failed")
+        # Linked images are not downloaded, their latency would only skew the histogram
+        if result == "downloaded":
+            self.metrics.observe("download_seconds", seconds, tag=tag)
+            self.metrics.inc("downloaded_bytes_total", os.path.getsize(image_path), tag=tag)
+
+    def flush(self):
+        """
+        Blocks until every queued download has finished.
+        """
+        self.jobs.join()
+
+    def close(self):
+        """
+        Drains the queue and stops the worker threads.
+        """
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,96 @@
+import queue
+from selenium.common.exceptions import WebDriverException
+
+
+class WebDriverPool:
+    """
+    A pool of headless browsers the fetch stage workers load post pages on in parallel.
+    """
+    def __init__(self, create_driver, size=4, metrics=None):
+        """
+        Initializes the WebDriverPool and starts its browsers.
+
+        Args:
+            create_driver (callable): Function returning a new, ready to use WebDriver.
+            size (int, optional): Number of browser workers. Defaults to 4.
+            metrics (Metrics, optional): Registry the browser restarts are counted in. Defaults to None.
+        """
+        self.create_driver = create_driver
+        self.metrics = metrics
+        self.size = size
+        self.drivers = queue.Queue()
+        for _ in range(size):
+            self.drivers.put(create_driver())
+
+    def healthy(self, driver):
+        """
+        Checks whether a browser still responds.
+
+        Args:
+            driver (WebDriver): WebDriver to check.
+
+        Returns:
+            bool: True if the browser responds, False otherwise.
+        """
+        try:
+            driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def restart(self, driver, tag=None):
+        """
+        Replaces a browser with a new one.
+
+        Args:
+            driver (WebDriver): WebDriver to replace.
+            tag (str, optional): Tag the restart is counted under in the metrics. Defaults to None.
+
+        Returns:
+            WebDriver: The new WebDriver.
+        """
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+        if self.metrics is not None:
+            self.metrics.inc("driver_restarts_total", tag=tag, driver="post")
+        return self.create_driver()
+
+    def run(self, func, item, tag=None):
+        """
+        Runs func(driver, item) on a free browser, restarting the browser once if it fails.
+
+        Args:
+            func (callable): Function taking a WebDriver and an item.
+            item: Item to process.
+            tag (str, optional): Tag restarts are counted under in the metrics. Defaults to None.
+
+        Returns:
+            The return value of func, or None if it failed twice.
+        """
+        driver = self.drivers.get()
+        try:
+            if not self.healthy(driver):
+                driver = self.restart(driver, tag)
+            try:
+                return func(driver, item)
+            except WebDriverException as e:
+                print(f"- Browser worker failed on {item}, restarting it ({e.__class__.__name__})")
+                driver = self.restart(driver, tag)
+                try:
+                    return func(driver, item)
+                except WebDriverException:
+                    return None
+        finally:
+            self.drivers.put(driver)
+
+    def close(self):
+        """
+        Closes every browser.
+        """
+        while not self.drivers.empty():
+            try:
+                self.drivers.get_nowait().quit()
+            except WebDriverException:
+                pass
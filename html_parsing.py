@@ -0,0 +1,34 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml builds the tree several times faster than the pure Python html.parser
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+# Subtrees the scrapers read, everything else on the page is skipped while parsing
+LISTING_STRAINER = SoupStrainer("div", class_=re.compile(r"(^|\s)posts-container(\s|$)"))
+DANBOORU_POST_STRAINER = SoupStrainer(id=["image", "tag-list", "post-information"])
+SANKAKU_POST_STRAINER = SoupStrainer(id=["stats", "highres", "image-link", "image", "tag-sidebar"])
+
+
+def parse_html(html, parse_only=None, required=()):
+    """
+    Parses a page with the fastest available tree builder.
+
+    Args:
+        html (str): Page source.
+        parse_only (SoupStrainer, optional): Subtrees to parse. Defaults to the whole page.
+        required (tuple, optional): CSS selectors that must all be found in the parsed subtrees,
+            the whole page is parsed again if one is not. Defaults to ().
+
+    Returns:
+        BeautifulSoup: Parsed HTML document.
+    """
+    soup = BeautifulSoup(html, PARSER, parse_only=parse_only)
+    if parse_only is not None and any(soup.select_one(selector) is None for selector in required):
+        # The page layout changed or the element is missing, fall back to a full parse
+        soup = BeautifulSoup(html, PARSER)
+    return soup
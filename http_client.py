@@ -0,0 +1,169 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rate_limiter import is_challenge
+
+
+class HttpClient:
+    """
+    A pooled HTTP client shared by the scrapers for API requests and downloads.
+    """
+    def __init__(self,
+                 pool_size=10,
+                 timeout=60,
+                 chunk_size=1024 * 1024,
+                 retries=5,
+                 backoff_factor=1.0,
+                 rate_limiter=None,
+                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"):
+        """
+        Initializes the HttpClient with the given parameters.
+
+        Args:
+            pool_size (int, optional): Number of keep-alive connections kept per host. Defaults to 10.
+            timeout (float, optional): Connect and read timeout in seconds. Defaults to 60.
+            chunk_size (int, optional): Size of the chunks written while downloading. Defaults to 1 MiB.
+            retries (int, optional): Number of retries on connection errors, 429 and 5xx. Defaults to 5.
+            backoff_factor (float, optional): Base of the exponential backoff between retries. Defaults to 1.0.
+            rate_limiter (RateLimiter, optional): Per-host rate limiter every request goes through. Defaults to None.
+            user_agent (str, optional): User agent sent with every request.
+        """
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.rate_limiter = rate_limiter
+
+        # Retry with exponential backoff, honouring Retry-After on 429/503.
+        # With a rate limiter, statuses are retried in get() so that the limiter sees every one of them
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504) if rate_limiter is None else (),
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=rate_limiter is None,
+            raise_on_status=False
+        )
+
+        # Each host (site, CDN) gets its own pool of pool_size keep-alive connections
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": user_agent})
+
+    def get(self, url, **kwargs):
+        """
+        Sends a GET request through the pooled session.
+
+        Args:
+            url (str): URL to request.
+            **kwargs: Extra arguments passed to requests.
+
+        Returns:
+            requests.Response: The response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limiter is None:
+            return self.session.get(url, **kwargs)
+
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire(url)
+            start = time.monotonic()
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.exceptions.RequestException:
+                self.rate_limiter.record(url, latency=time.monotonic() - start)
+                raise
+            challenge = is_challenge(response.status_code, response.headers)
+            throttled = self.rate_limiter.record(url, response.status_code, time.monotonic() - start,
+                                                 response.headers.get("Retry-After"), challenge)
+            # Challenges are not retried, the caller can switch to a browser
+            if response.status_code < 500 and not throttled or challenge or attempt == self.retries:
+                return response
+            response.close()
+
+    def download(self, url, path, digest=None):
+        """
+        Streams a file to path + ".part" in chunk_size chunks and renames it to path once its
+        length is verified. An interrupted transfer is resumed with a Range request, also
+        across runs since the part file is kept.
+
+        Args:
+            url (str): URL of the file to download.
+            path (str): Path to save the file to.
+            digest (hashlib hash, optional): Hash updated with the content of the complete file. Defaults to None.
+
+        Returns:
+            int: Size of the file, or None if it could not be downloaded completely.
+        """
+        part_path = path + ".part"
+        for attempt in range(self.retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            # Compressed transfers would not match the file length
+            headers = {"Accept-Encoding": "identity"}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                with self.get(url, stream=True, headers=headers) as response:
+                    if response.status_code == 416:
+                        # The part file is already complete, or larger than the remote file
+                        if content_range_total(response.headers.get("Content-Range")) == offset:
+                            break
+                        os.remove(part_path)
+                        continue
+                    if response.status_code not in (200, 206):
+                        print(f"- Download failed: {url} (status {response.status_code})")
+                        return None
+                    if response.status_code == 206:
+                        total = content_range_total(response.headers.get("Content-Range"))
+                    else:
+                        # The server ignored the Range header, start over
+                        offset = 0
+                        total = response.headers.get("Content-Length")
+                        total = int(total) if total is not None else None
+                    with open(part_path, 'ab' if offset else 'wb') as f:
+                        for chunk in response.iter_content(self.chunk_size):
+                            f.write(chunk)
+            except requests.exceptions.RequestException as e:
+                print(f"- Download interrupted: {url} ({e.__class__.__name__}), resuming")
+                continue
+
+            size = os.path.getsize(part_path)
+            if total is None or size == total:
+                break
+            print(f"- Download incomplete: {url} ({size}/{total} bytes), resuming")
+            if size > total:
+                os.remove(part_path)
+        else:
+            return None
+
+        if digest is not None:
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    digest.update(chunk)
+        os.replace(part_path, path)
+        return os.path.getsize(path)
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
+
+
+def content_range_total(content_range):
+    """
+    Parses the complete length of a Content-Range header.
+
+    Args:
+        content_range (str): Header value, e.g. "bytes 100-199/1000".
+
+    Returns:
+        int: The complete length, or None if it is missing or unknown.
+    """
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
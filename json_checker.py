@@ -6,56 +6,219 @@ Created on Thu Aug 15 20:06:31 2024
 """
 
 import os
+import tempfile
 from os.path import join
-from os import listdir
+import ast
+import csv
 import json
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import pandas as pd
 
-def compile_json_to_dataframe(directory):
+# orjson parses several times faster when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is only needed to export Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+def iter_talent_dirs(directory):
+    """
+    Yields the talent directories of the specified directory, laid out as <gen>/<talent>/.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+
+    Yields:
+        tuple: The gen name, the talent name and the path of the talent directory.
+    """
+    with os.scandir(directory) as gens:
+        for gen in gens:
+            if not gen.is_dir():
+                continue
+            with os.scandir(gen.path) as talents:
+                for talent in talents:
+                    if talent.is_dir():
+                        yield gen.name, talent.name, talent.path
+
+# Files of a tag directory that end with .json but are not post metadata, e.g. the run summaries
+# older versions of the scrapers wrote before they were moved to metrics.jsonl
+NON_METADATA_FILES = {"metrics.json"}
+
+def is_metadata_file(entry):
+    """
+    Checks whether a directory entry is the JSON metadata of a post.
+
+    Args:
+        entry (os.DirEntry): Entry of a talent directory.
+
+    Returns:
+        bool: True if the entry is a metadata file, False otherwise.
+    """
+    return entry.name.endswith(".json") and entry.name not in NON_METADATA_FILES and entry.is_file()
+
+def iter_json_files(directory):
+    """
+    Yields the JSON files of the specified directory, laid out as <gen>/<talent>/<file>.json.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+
+    Yields:
+        str: Path to a JSON file.
+    """
+    for _, _, path in iter_talent_dirs(directory):
+        with os.scandir(path) as files:
+            for entry in files:
+                if is_metadata_file(entry):
+                    yield entry.path
+
+def load_json(data):
+    """
+    Parses a JSON document.
+
+    Args:
+        data (bytes): Content of a JSON file.
+
+    Returns:
+        dict: The parsed JSON document.
+    """
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def load_json_batch(paths):
+    """
+    Parses a batch of JSON files, run on the worker processes.
+
+    Args:
+        paths (list): Paths to the JSON files.
+
+    Returns:
+        list: The parsed JSON files.
+    """
+    records = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            records.append(load_json(f.read()))
+    return records
+
+def iter_record_batches(directory, workers=None, batch_size=1000):
+    """
+    Parses the JSON files of the specified directory on a process pool.
+
+    At most two batches per worker are in flight, so memory stays bounded
+    no matter how large the directory is.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        batch_size (int, optional): Number of files per batch. Defaults to 1000.
+
+    Yields:
+        list: A batch of parsed JSON files, in walk order.
+    """
+    workers = workers or os.cpu_count() or 1
+    paths = iter_json_files(directory)
+    batches = iter(lambda: list(islice(paths, batch_size)), [])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        max_in_flight = 2 * workers
+        for batch in batches:
+            in_flight.append(executor.submit(load_json_batch, batch))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def compile_json_to_dataframe(directory, workers=None):
     """
     Compiles JSON files in the specified directory into a DataFrame.
 
     Args:
         directory (str): Path to the directory containing JSON files.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
 
     Returns:
         tuple: A DataFrame containing the compiled data and a list of all data.
     """
     # List to hold the data from all JSON files
     all_data = []
-    
-    subdirs = listdir(directory)
-    # print(subdirs)
-
-    # Iterate through all files in the specified directory
-    for subdir in subdirs:
-        for talent in listdir(join(directory, subdir)):
-            files = listdir(join(directory, subdir, talent))
-            print(f"{talent}: {len(files)}")
-            for filename in files:
-                if filename.endswith(".json"):
-                    file_path = join(directory, subdir, talent, filename)
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                        all_data.append(data)
+    for records in iter_record_batches(directory, workers=workers):
+        all_data.extend(records)
 
     # Create a DataFrame from the list of dictionaries
     df = pd.DataFrame(all_data)
     
     return df, all_data
 
+def add_csv_columns(path, columns):
+    """
+    Rewrites the header of a CSV file with more columns and pads the rows written so far.
+
+    Args:
+        path (str): Path to the CSV file.
+        columns (list): The new columns, starting with the current ones.
+    """
+    temp_path = path + ".tmp"
+    with open(path, 'r', newline='', encoding='utf-8') as src, \
+         open(temp_path, 'w', newline='', encoding='utf-8') as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst, lineterminator=os.linesep)
+        next(reader)
+        writer.writerow(columns)
+        for row in reader:
+            writer.writerow(row + [''] * (len(columns) - len(row)))
+    os.replace(temp_path, path)
+
+def compile_json_to_csv(directory, output, workers=None, batch_size=1000):
+    """
+    Compiles JSON files in the specified directory into a CSV file, one batch at a time.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        output (str): Path to the CSV file to write.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        batch_size (int, optional): Number of files per batch. Defaults to 1000.
+
+    Returns:
+        int: Number of records written.
+    """
+    columns = None
+    total = 0
+    for records in iter_record_batches(directory, workers=workers, batch_size=batch_size):
+        df = pd.DataFrame(records)
+        if columns is None:
+            columns = list(df.columns)
+            df.to_csv(output, index=False)
+            total += len(df)
+            continue
+
+        # Keys first seen in this batch, e.g. from another site, are added as columns
+        new_columns = [column for column in df.columns if column not in columns]
+        if new_columns:
+            columns += new_columns
+            add_csv_columns(output, columns)
+        df.reindex(columns=columns).to_csv(output, mode='a', header=False, index=False)
+        total += len(df)
+    return total
+
 if __name__ == "__main__":
     # Specify the directory containing the JSON files
     json_directory = "scraped_images"  # Replace with your directory
     
-    # Compile the JSON files into a DataFrame
-    dataframe, all_data = compile_json_to_dataframe(json_directory)
+    # Compile the JSON files into a CSV file without holding them all in memory
+    total = compile_json_to_csv(json_directory, 'compiled_data.csv')
     
-    # Display the DataFrame
-    print(dataframe)
-
-    # Save the DataFrame to a CSV file (optional)
-    dataframe.to_csv('compiled_data.csv', index=False)
+    # Display the number of compiled records
+    print(f"Compiled {total} records")
 
 #%%
 # names = []
@@ -64,6 +227,8 @@ if __name__ == "__main__":
 #         names.append(i['character_tags'][0])
 
 #%%
+RATINGS = ["Explicit", "General", "Questionable", "Sensitive"]
+
 def count_json_files_in_subdirs(base_dir):
     """
     Counts the number of JSON files in subdirectories.
@@ -77,41 +242,23 @@ def count_json_files_in_subdirs(base_dir):
     data = []
 
     # Traverse the directory structure
-    for subdir_1 in os.listdir(base_dir):
-        subdir_1_path = os.path.join(base_dir, subdir_1)
-        if os.path.isdir(subdir_1_path):
-            for subdir_2 in os.listdir(subdir_1_path):
-                subdir_2_path = os.path.join(subdir_1_path, subdir_2)
-                if os.path.isdir(subdir_2_path):
-                    # Count the number of JSON files in subdir_2
-                    json_count = len([f for f in os.listdir(subdir_2_path) if f.endswith('.json')])
-                    # Append the information to the list of dictionaries
-                    data.append({
-                        'name': subdir_2,
-                        'count': json_count,
-                        'gen': subdir_1
-                    })
+    for gen, name, path in iter_talent_dirs(base_dir):
+        with os.scandir(path) as files:
+            json_count = sum(1 for entry in files if is_metadata_file(entry))
+        # Append the information to the list of dictionaries
+        data.append({
+            'name': name,
+            'count': json_count,
+            'gen': gen
+        })
 
     # Transform the list of dictionaries into a DataFrame
     df = pd.DataFrame(data)
     return df
 
-if __name__ == "__main__":
-    # Specify the base directory containing the 'scraped_images' folder
-    base_directory = "scraped_images"
-    
-    # Get the DataFrame with the JSON file counts
-    json_counts_df = count_json_files_in_subdirs(base_directory)
-    
-    # Display the DataFrame
-    print(json_counts_df)
-
-    # Optionally, save the DataFrame to a CSV file
-    json_counts_df.to_csv("json_counts.csv", index=False)
-#%%
 def count_json_files(base_dir):
     """
-    Counts the number of JSON files and their ratings in subdirectories.
+    Counts the number of JSON files and their ratings in subdirectories in a single pass.
 
     Args:
         base_dir (str): Path to the base directory.
@@ -119,52 +266,30 @@ def count_json_files(base_dir):
     Returns:
         DataFrame: A DataFrame containing the counts of JSON files and their ratings.
     """
-    data = []
+    talents = []
+    ratings = []
 
-    # First pass: Traverse the directory structure to count JSON files
-    for subdir_1 in os.listdir(base_dir):
-        subdir_1_path = os.path.join(base_dir, subdir_1)
-        if os.path.isdir(subdir_1_path):
-            for subdir_2 in os.listdir(subdir_1_path):
-                subdir_2_path = os.path.join(subdir_1_path, subdir_2)
-                if os.path.isdir(subdir_2_path):
-                    # Count the number of JSON files in subdir_2
-                    json_files = [f for f in os.listdir(subdir_2_path) if f.endswith('.json')]
-                    json_count = len(json_files)
-
-                    # Append the initial information to the list of dictionaries
-                    data.append({
-                        'name': subdir_2,
-                        'count': json_count,
-                        'gen': subdir_1,
-                        'Explicit': 0,
-                        'General': 0,
-                        'Questionable': 0,
-                        'Sensitive': 0
-                    })
+    # Collect one (name, gen, rating) row per JSON file
+    for gen, name, path in iter_talent_dirs(base_dir):
+        talents.append((name, gen))
+        with os.scandir(path) as files:
+            for entry in files:
+                if is_metadata_file(entry):
+                    with open(entry.path, 'rb') as f:
+                        ratings.append((name, gen, load_json(f.read()).get("rating")))
 
-    # Transform the list of dictionaries into a DataFrame
-    df = pd.DataFrame(data)
-
-    # Second pass: Traverse the directory structure to update rating counts
-    for subdir_1 in os.listdir(base_dir):
-        subdir_1_path = os.path.join(base_dir, subdir_1)
-        if os.path.isdir(subdir_1_path):
-            for subdir_2 in os.listdir(subdir_1_path):
-                subdir_2_path = os.path.join(subdir_1_path, subdir_2)
-                if os.path.isdir(subdir_2_path):
-                    # Traverse each JSON file to count ratings
-                    for json_file in os.listdir(subdir_2_path):
-                        if json_file.endswith('.json'):
-                            json_file_path = os.path.join(subdir_2_path, json_file)
-                            with open(json_file_path, 'r') as f:
-                                json_data = json.load(f)
-                                rating = json_data.get("rating")
-                                if rating in ["Explicit", "General", "Questionable", "Sensitive"]:
-                                    # Increment the appropriate rating count in the DataFrame
-                                    df.loc[df['name'] == subdir_2, rating] += 1
+    # Aggregate the rows with one groupby instead of a DataFrame update per file
+    df = pd.DataFrame(talents, columns=['name', 'gen'])
+    files = pd.DataFrame(ratings, columns=['name', 'gen', 'rating'])
+    counts = files.groupby(['name', 'gen']).size().rename('count')
+    rating_counts = (files[files['rating'].isin(RATINGS)]
+                     .groupby(['name', 'gen', 'rating']).size()
+                     .unstack('rating', fill_value=0)
+                     .reindex(columns=RATINGS, fill_value=0))
 
-    return df
+    df = df.join(counts, on=['name', 'gen']).join(rating_counts, on=['name', 'gen'])
+    df[['count'] + RATINGS] = df[['count'] + RATINGS].fillna(0).astype(int)
+    return df[['name', 'count', 'gen'] + RATINGS]
 
 if __name__ == "__main__":
     # Specify the base directory containing the 'scraped_images' folder
@@ -176,6 +301,194 @@ if __name__ == "__main__":
     # Display the DataFrame
     print(json_counts_df)
 
-    # Optionally, save the DataFrame to a CSV file
+    # Optionally, save the DataFrames to CSV files
+    json_counts_df[['name', 'count', 'gen']].to_csv("json_counts.csv", index=False)
     json_counts_df.to_csv("json_counts_with_ratings.csv", index=False)
 
+#%%
+def count_ratings_in_sqlite(db_path):
+    """
+    Counts the posts and their ratings in a SQLite metadata store.
+
+    Args:
+        db_path (str): Path to the metadata.sqlite database written by the scrapers.
+
+    Returns:
+        DataFrame: A DataFrame containing the counts of posts and their ratings.
+    """
+    with sqlite3.connect(db_path) as connection:
+        counts = pd.read_sql_query(
+            """SELECT data_name AS gen, tag AS name, rating, COUNT(*) AS count
+               FROM posts GROUP BY data_name, tag, rating""",
+            connection)
+
+    # Same columns as count_json_files(), also for ratings without posts
+    rating_counts = (counts.pivot_table(index=['name', 'gen'], columns='rating', values='count', aggfunc='sum', fill_value=0)
+                     .reindex(columns=RATINGS, fill_value=0))
+    df = counts.groupby(['name', 'gen'])['count'].sum().reset_index().join(rating_counts, on=['name', 'gen'])
+    df[RATINGS] = df[RATINGS].fillna(0).astype(int)
+    return df[['name', 'count', 'gen'] + RATINGS]
+
+#%%
+SCALAR_COLUMNS = ["post_id", "rating", "source_url", "original_filename", "url"]
+
+def flatten_record(record):
+    """
+    Flattens a scraped JSON record into one column per tag type.
+
+    Args:
+        record (dict): Scraped metadata, with the tags either nested under "tags" or as *_tags keys.
+
+    Returns:
+        dict: The flattened record, with every tag column named <type>_tags.
+    """
+    row = {
+        "post_id": record.get("post_id"),
+        "rating": record.get("rating"),
+        "source_url": record.get("source_url"),
+        "original_filename": record.get("original_filename"),
+        "url": record.get("url") or record.get("danbooru_url") or record.get("original_url")
+    }
+    tags = dict(record.get("tags") or {})
+    for key, value in record.items():
+        if key.endswith("_tags"):
+            tags.setdefault(key, value)
+    for key, value in tags.items():
+        row[key if key.endswith("_tags") else f"{key}_tags"] = value
+    return row
+
+def rows_to_table(rows, tag_columns):
+    """
+    Builds an Arrow table with dictionary-encoded ratings and list<string> tag columns.
+
+    Args:
+        rows (list): Flattened records.
+        tag_columns (list): Names of the tag columns.
+
+    Returns:
+        pyarrow.Table: The table.
+    """
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    columns = {}
+    for column in SCALAR_COLUMNS:
+        values = [row.get(column) for row in rows]
+        values = [None if value is None or value != value else str(value) for value in values]
+        columns[column] = pa.array(values, pa.string())
+    columns["rating"] = columns["rating"].cast(dictionary)
+    for column in tag_columns:
+        values = [row.get(column) or [] for row in rows]
+        columns[column] = pa.array(values, pa.list_(pa.string())).cast(pa.list_(dictionary))
+    return pa.table(columns)
+
+def conform_table(table, schema):
+    """
+    Adds the columns of a schema missing from a table, tag columns as empty lists, and orders them.
+
+    Args:
+        table (pyarrow.Table): Table of one batch.
+        schema (pyarrow.Schema): Schema of the whole file.
+
+    Returns:
+        pyarrow.Table: The table with the schema.
+    """
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name))
+        elif pa.types.is_list(field.type):
+            columns.append(pa.array([[]] * len(table), pa.list_(pa.string())).cast(field.type))
+        else:
+            columns.append(pa.nulls(len(table), field.type))
+    return pa.table(columns, schema=schema)
+
+def write_parquet(row_batches, output, tag_columns=None, row_group_size=100000):
+    """
+    Writes batches of flattened records into a Parquet file.
+
+    Without tag_columns, every batch is first written to its own temporary file with the tag
+    columns it has, and the batches are merged under the union of their schemas, so tag types
+    only found in later batches are kept.
+
+    Args:
+        row_batches (iterable): Batches of flattened records.
+        output (str): Path to the Parquet file to write.
+        tag_columns (list, optional): Names of the tag columns. Defaults to the tag columns of every batch.
+        row_group_size (int, optional): Maximum number of rows per row group. Defaults to 100000.
+
+    Returns:
+        int: Number of records written.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to export Parquet, install it with 'pip install pyarrow'")
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output))) as temp_dir:
+        batch_paths = []
+        schemas = []
+        total = 0
+        for rows in row_batches:
+            columns = tag_columns
+            if columns is None:
+                columns = list(dict.fromkeys(column for row in rows for column in row if column.endswith("_tags")))
+            table = rows_to_table(rows, columns)
+            batch_paths.append(join(temp_dir, f"{len(batch_paths)}.parquet"))
+            pq.write_table(table, batch_paths[-1], compression="none")
+            schemas.append(table.schema)
+            total += len(rows)
+
+        if not schemas:
+            return 0
+        schema = pa.unify_schemas(schemas)
+        with pq.ParquetWriter(output, schema, compression="zstd",
+                              use_dictionary=True, write_statistics=True) as writer:
+            for batch_path in batch_paths:
+                writer.write_table(conform_table(pq.read_table(batch_path), schema), row_group_size=row_group_size)
+    return total
+
+def compile_json_to_parquet(directory, output, workers=None, batch_size=1000):
+    """
+    Compiles JSON files in the specified directory into a Parquet file.
+
+    Args:
+        directory (str): Path to the directory containing JSON files.
+        output (str): Path to the Parquet file to write.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        batch_size (int, optional): Number of files per batch. Defaults to 1000.
+
+    Returns:
+        int: Number of records written.
+    """
+    row_batches = ([flatten_record(record) for record in records]
+                   for records in iter_record_batches(directory, workers=workers, batch_size=batch_size))
+    return write_parquet(row_batches, output)
+
+def convert_csv_to_parquet(csv_path, output, chunksize=10000):
+    """
+    Converts a compiled CSV file, whose tag columns hold Python list reprs, into a Parquet file.
+
+    Args:
+        csv_path (str): Path to the compiled CSV file.
+        output (str): Path to the Parquet file to write.
+        chunksize (int, optional): Number of CSV rows converted at a time. Defaults to 10000.
+
+    Returns:
+        int: Number of records written.
+    """
+    def row_batches():
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            for column in chunk.columns:
+                if column.endswith("_tags"):
+                    chunk[column] = [ast.literal_eval(value) if value else [] for value in chunk[column]]
+            chunk = chunk.replace("", None)
+            yield [flatten_record(row) for row in chunk.to_dict("records")]
+
+    return write_parquet(row_batches(), output)
+
+if __name__ == "__main__":
+    # Specify the directory containing the JSON files
+    json_directory = "scraped_images"  # Replace with your directory
+
+    # Compile the JSON files into a Parquet file with native list columns
+    total = compile_json_to_parquet(json_directory, 'compiled_data.parquet')
+
+    # Display the number of compiled records
+    print(f"Compiled {total} records")
@@ -0,0 +1,56 @@
+from selenium.common.exceptions import WebDriverException
+
+# Resources the scrapers never read, page_source and element attributes are enough
+BLOCKED_EXTENSIONS = ["jpg", "jpeg", "png", "gif", "webp", "avif", "svg", "ico", "bmp",
+                      "mp4", "webm", "mov", "m4v", "mp3", "ogg",
+                      "woff", "woff2", "ttf", "otf", "eot",
+                      "css"]
+
+# Ad and analytics hosts embedded in the booru pages
+AD_HOSTS = ["doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+            "googletagmanager.com", "adservice.google.com", "exoclick.com", "exosrv.com", "juicyads.com",
+            "trafficjunky.net", "realsrv.com", "magsrv.com", "tsyndicate.com", "a-ads.com",
+            "scorecardresearch.com", "quantserve.com", "hotjar.com"]
+
+BLOCKED_URL_PATTERNS = ([pattern for extension in BLOCKED_EXTENSIONS for pattern in (f"*.{extension}", f"*.{extension}?*")]
+                        + [f"*{host}*" for host in AD_HOSTS])
+
+
+def apply_lean_options(chrome_options):
+    """
+    Configures Chrome to load only the documents and scripts of a page.
+
+    Args:
+        chrome_options (Options): Chrome options to configure.
+    """
+    # Return once the DOM is parsed, the scrapers wait for their own target elements
+    chrome_options.page_load_strategy = "eager"
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-default-apps")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.media_stream": 2,
+        "profile.managed_default_content_settings.popups": 2,
+        "profile.managed_default_content_settings.notifications": 2,
+        "profile.managed_default_content_settings.geolocation": 2
+    })
+
+
+def block_resources(driver):
+    """
+    Blocks media, fonts, stylesheets and ad hosts at the network level through CDP.
+
+    Args:
+        driver (WebDriver): Chrome WebDriver.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except WebDriverException as e:
+        # The prefs and blink settings still block images
+        print(f"- Could not block resources through CDP ({e.__class__.__name__})")
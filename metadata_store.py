@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+
+
+class SqliteMetadataStore:
+    """
+    A metadata sink that writes posts and their tags into a single SQLite database.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY,
+            site TEXT NOT NULL,
+            data_name TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            post_id TEXT,
+            rating TEXT,
+            post_url TEXT,
+            original_filename TEXT,
+            source_url TEXT,
+            UNIQUE (data_name, tag, file_name)
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            UNIQUE (type, name)
+        );
+        CREATE TABLE IF NOT EXISTS post_tags (
+            post INTEGER NOT NULL REFERENCES posts (id),
+            tag INTEGER NOT NULL REFERENCES tags (id),
+            PRIMARY KEY (post, tag)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS posts_rating ON posts (data_name, tag, rating);
+        CREATE INDEX IF NOT EXISTS posts_post_id ON posts (site, post_id);
+        CREATE INDEX IF NOT EXISTS post_tags_tag ON post_tags (tag);
+    """
+
+    def __init__(self, db_path, batch_size=100):
+        """
+        Initializes the SqliteMetadataStore and creates the schema if needed.
+
+        Args:
+            db_path (str): Path to the SQLite database.
+            batch_size (int, optional): Number of posts written per transaction. Defaults to 100.
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pending = 0
+        self.batch = 0
+        self.tag_ids = {}
+
+        # The connection is shared by the workers of the tag scheduler
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def tag_id(self, tag_type, name):
+        """
+        Returns the row ID of a tag, inserting it if needed.
+
+        Args:
+            tag_type (str): Type of the tag, e.g. "character_tags".
+            name (str): Name of the tag.
+
+        Returns:
+            int: Row ID of the tag.
+        """
+        key = (tag_type, name)
+        if key not in self.tag_ids:
+            self.connection.execute("INSERT OR IGNORE INTO tags (type, name) VALUES (?, ?)", key)
+            self.tag_ids[key] = self.connection.execute(
+                "SELECT id FROM tags WHERE type = ? AND name = ?", key).fetchone()[0]
+        return self.tag_ids[key]
+
+    def save(self, site, data_name, tag, file_name, metadata):
+        """
+        Saves the metadata of a post.
+
+        Args:
+            site (str): Name of the site, e.g. "danbooru".
+            data_name (str): Name of the data category.
+            tag (str): Tag the post was collected under.
+            file_name (str): Name of the saved image file.
+            metadata (dict): Metadata of the post.
+
+        Returns:
+            int: Number of the batch the post is committed with, see committed().
+        """
+        with self.lock:
+            post_url = metadata.get("danbooru_url") or metadata.get("original_url")
+            # Drop the tag links of a post saved under the same file name before
+            self.connection.execute(
+                """DELETE FROM post_tags WHERE post IN
+                   (SELECT id FROM posts WHERE data_name = ? AND tag = ? AND file_name = ?)""",
+                (data_name, tag, file_name))
+            cursor = self.connection.execute(
+                """INSERT OR REPLACE INTO posts
+                   (site, data_name, tag, file_name, post_id, rating, post_url, original_filename, source_url)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (site, data_name, tag, file_name, metadata.get("post_id"), metadata.get("rating"),
+                 post_url, metadata.get("original_filename"), metadata.get("source_url")))
+            post = cursor.lastrowid
+
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO post_tags (post, tag) VALUES (?, ?)",
+                [(post, self.tag_id(tag_type, name))
+                 for tag_type, names in metadata.get("tags", {}).items()
+                 for name in names])
+
+            batch = self.batch
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self.commit()
+            return batch
+
+    def committed(self, batch):
+        """
+        Checks whether a batch of posts was committed.
+
+        Args:
+            batch (int): Number of the batch returned by save().
+
+        Returns:
+            bool: True if the batch was committed, False otherwise.
+        """
+        with self.lock:
+            return batch < self.batch
+
+    def rating_counts(self):
+        """
+        Counts the posts of every tag by rating.
+
+        Returns:
+            list: List of (data_name, tag, rating, count) rows.
+        """
+        with self.lock:
+            self.commit()
+            return self.connection.execute(
+                """SELECT data_name, tag, rating, COUNT(*) FROM posts
+                   GROUP BY data_name, tag, rating""").fetchall()
+
+    def commit(self):
+        """
+        Commits the pending batch of posts.
+        """
+        with self.lock:
+            self.connection.commit()
+            self.pending = 0
+            self.batch += 1
+
+    def close(self):
+        """
+        Commits the pending batch and closes the database.
+        """
+        self.commit()
+        self.connection.close()
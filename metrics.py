@@ -0,0 +1,313 @@
+import time
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Descriptions of the metrics recorded by the scrapers, shown on the metrics endpoint
+HELP = {
+    "pages_total": "Listing pages loaded.",
+    "posts_total": "Listed posts by outcome: accepted, seen, prefiltered, rejected or duplicate.",
+    "posts_rejected_total": "Posts rejected by a filter, by reason, including posts fetched ahead of the image limit.",
+    "downloads_total": "Image downloads by result: downloaded, linked or failed.",
+    "downloaded_bytes_total": "Bytes of images downloaded.",
+    "driver_restarts_total": "WebDriver restarts.",
+    "page_load_seconds": "Time to load a listing or post page, without the rate limiter waits.",
+    "rate_limit_wait_seconds": "Time a listing or post page load waited for the rate limiter.",
+    "parse_seconds": "Time to parse a listing or post page.",
+    "download_seconds": "Time to download an image.",
+    "metadata_write_seconds": "Time to write the metadata of a post.",
+}
+
+
+class Histogram:
+    """
+    The bucket counts, sum and maximum of one latency series.
+    """
+    def __init__(self, buckets):
+        """
+        Initializes an empty Histogram.
+
+        Args:
+            buckets (tuple): Upper bounds of the buckets in seconds.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        Adds a value to the histogram.
+
+        Args:
+            value (float): Observed value in seconds.
+        """
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: The estimate, at most the maximum observed value.
+        """
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Thread-safe counters and latency histograms of a scraping run, labelled by tag and outcome.
+    They are exposed in the Prometheus text format on an optional HTTP endpoint and summarized per tag as JSON.
+    """
+    def __init__(self, namespace="booru", labels=None, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes an empty Metrics registry.
+
+        Args:
+            namespace (str, optional): Prefix of the metric names on the endpoint. Defaults to "booru".
+            labels (dict, optional): Labels added to every series on the endpoint, e.g. the site. Defaults to None.
+            buckets (tuple, optional): Upper bounds of the histogram buckets in seconds. Defaults to DEFAULT_BUCKETS.
+        """
+        self.namespace = namespace
+        self.labels = labels or {}
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def key(self, name, labels):
+        """
+        Returns the key of a series.
+
+        Args:
+            name (str): Name of the metric.
+            labels (dict): Labels of the series, the ones set to None are left out.
+
+        Returns:
+            tuple: The name and the sorted labels.
+        """
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items() if value is not None))
+
+    def inc(self, name, value=1, **labels):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (float, optional): Amount to add. Defaults to 1.
+            **labels: Labels of the series.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Adds a latency to a histogram.
+
+        Args:
+            name (str): Name of the histogram.
+            seconds (float): Observed latency.
+            **labels: Labels of the series.
+        """
+        key = self.key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(seconds)
+
+    @contextmanager
+    def time(self, name, **labels):
+        """
+        Observes the time spent in a with block, also when it raises.
+
+        Args:
+            name (str): Name of the histogram.
+            **labels: Labels of the series.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self, **labels):
+        """
+        Summarizes the series having the given labels.
+
+        Args:
+            **labels: Labels every summarized series must have, e.g. tag.
+
+        Returns:
+            dict: Counter values and histogram statistics by metric name, then by the other labels
+            of the series if it has any, e.g. {"posts_total": {"result=accepted": 12}, "pages_total": 3}.
+        """
+        selected = set(self.key("", labels)[1])
+
+        def series_name(key):
+            return ",".join(f"{label}={value}" for label, value in key[1] if (label, value) not in selected)
+
+        summary = {"counters": {}, "histograms": {}}
+        with self.lock:
+            for key, value in sorted(self.counters.items()):
+                if selected.issubset(key[1]):
+                    summary["counters"].setdefault(key[0], {})[series_name(key)] = value
+            for key, histogram in sorted(self.histograms.items()):
+                if selected.issubset(key[1]):
+                    summary["histograms"].setdefault(key[0], {})[series_name(key)] = {
+                        "count": histogram.count,
+                        "mean": histogram.sum / histogram.count,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "max": histogram.max,
+                    }
+        for metrics in summary.values():
+            for name, series in metrics.items():
+                if list(series) == [""]:
+                    metrics[name] = series[""]
+        return summary
+
+    def render(self):
+        """
+        Renders every series in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        def label_string(labels, extra=()):
+            pairs = list(self.labels.items()) + list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        described = set()
+        with self.lock:
+            for key, value in sorted(self.counters.items()):
+                name = f"{self.namespace}_{key[0]}"
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {HELP.get(key[0], key[0])}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{label_string(key[1])} {value}")
+            for key, histogram in sorted(self.histograms.items()):
+                name = f"{self.namespace}_{key[0]}"
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {HELP.get(key[0], key[0])}")
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_string(key[1], [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{label_string(key[1], [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{label_string(key[1])} {histogram.sum}")
+                lines.append(f"{name}_count{label_string(key[1])} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host=""):
+        """
+        Serves the metrics page at /metrics on a background thread.
+
+        Args:
+            port (int): Port to listen on, 0 for a free one.
+            host (str, optional): Address to listen on. Defaults to every address.
+
+        Returns:
+            int: The port listened on.
+        """
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.metrics = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"-- Metrics served on port {self.server.server_address[1]}")
+        return self.server.server_address[1]
+
+    def close(self):
+        """
+        Stops the metrics endpoint.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class TagMetrics:
+    """
+    Mixin recording the metrics of a scraper under the tag it is scraping. The class
+    using it sets self.metrics and self.cur_tag.
+    """
+    def tag_name(self):
+        """
+        Returns the name of the tag being scraped, without the site filters.
+
+        Returns:
+            str: The decoded tag.
+        """
+        return urllib.parse.unquote(self.cur_tag.split('+')[0])
+
+    def timed(self, name, **labels):
+        """
+        Times a with block into a latency histogram of the current tag.
+
+        Args:
+            name (str): Name of the histogram, e.g. "parse_seconds".
+            **labels: Other labels of the series, e.g. page="post".
+
+        Returns:
+            The context manager timing the block.
+        """
+        return self.metrics.time(name, tag=self.tag_name(), **labels)
+
+    def count_rejection(self, reason):
+        """
+        Counts a post rejected by a filter of the current tag.
+
+        Args:
+            reason (str): Why the post was rejected, e.g. "format" or "rating".
+        """
+        self.metrics.inc("posts_rejected_total", tag=self.tag_name(), reason=reason)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Answers the scrape requests of Prometheus.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,122 @@
+import time
+import threading
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+def is_challenge_page(driver):
+    """
+    Detects a Cloudflare challenge page in a WebDriver.
+
+    Args:
+        driver (WebDriver): WebDriver showing the page.
+
+    Returns:
+        bool: True if the page is a challenge page.
+    """
+    try:
+        title = driver.title
+    except WebDriverException:
+        return False
+    return title.startswith("Just a moment") or title.startswith("Attention Required")
+
+
+class PageWaiter:
+    """
+    Loads pages in a WebDriver and returns as soon as a target element is present,
+    recording how long every load took.
+    """
+    def __init__(self, timeout=10, poll_frequency=0.1, rate_limiter=None):
+        """
+        Initializes the PageWaiter with the given parameters.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait for the target element. Defaults to 10.
+            poll_frequency (float, optional): Seconds between two checks for the element. Defaults to 0.1.
+            rate_limiter (RateLimiter, optional): Per-host rate limiter every page load goes through. Defaults to None.
+        """
+        self.timeout = timeout
+        self.poll_frequency = poll_frequency
+        self.rate_limiter = rate_limiter
+        # Written by every fetch stage worker of the scraper
+        self.lock = threading.Lock()
+        self.load_times = {}
+
+    def load(self, driver, url, selector):
+        """
+        Loads a URL and waits for the target element.
+
+        Args:
+            driver (WebDriver): WebDriver to load the page in.
+            url (str): URL to load.
+            selector (str): CSS selector of the element to wait for, a group ("a, b") waits for any of them.
+
+        Returns:
+            bool: True if the element appeared before the timeout, False otherwise.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+        start = time.monotonic()
+        driver.get(url)
+        ready = self.wait(driver, selector, start)
+        if self.rate_limiter is not None:
+            # The browser does not expose the status code, a missing element counts as a failed load
+            self.rate_limiter.record(url, 200 if ready else None, time.monotonic() - start,
+                                     challenge=not ready and is_challenge_page(driver))
+        return ready
+
+    def wait(self, driver, selector, start=None):
+        """
+        Waits for the target element on the current page.
+
+        Args:
+            driver (WebDriver): WebDriver showing the page.
+            selector (str): CSS selector of the element to wait for.
+            start (float, optional): time.monotonic() value the load started at. Defaults to now.
+
+        Returns:
+            bool: True if the element appeared before the timeout, False otherwise.
+        """
+        if start is None:
+            start = time.monotonic()
+        try:
+            WebDriverWait(driver, self.timeout, poll_frequency=self.poll_frequency).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+            ready = True
+        except TimeoutException:
+            ready = False
+        with self.lock:
+            self.load_times.setdefault(selector, []).append(time.monotonic() - start)
+        return ready
+
+    def summary(self):
+        """
+        Summarizes the recorded load times.
+
+        Returns:
+            dict: Count, mean, median and maximum load time in seconds for every selector.
+        """
+        summary = {}
+        with self.lock:
+            load_times = {selector: list(times) for selector, times in self.load_times.items()}
+        for selector, times in load_times.items():
+            ordered = sorted(times)
+            summary[selector] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "median": ordered[len(ordered) // 2],
+                "max": ordered[-1]
+            }
+        return summary
+
+    def print_summary(self):
+        """
+        Prints the recorded load times and starts a new recording.
+        """
+        for selector, stats in self.summary().items():
+            print(f"-- Load time \"{selector}\": {stats['count']} pages, "
+                  f"mean {stats['mean']:.2f}s, median {stats['median']:.2f}s, max {stats['max']:.2f}s")
+        with self.lock:
+            self.load_times = {}
@@ -0,0 +1,125 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+
+
+class Stage:
+    """
+    A stage of the scraping pipeline: a bounded queue of items processed by its own worker threads.
+    Results come back as futures, so the next stage can consume them in listing order.
+    """
+    def __init__(self, name, func, workers=1, queue_size=64):
+        """
+        Initializes the Stage and starts its worker threads.
+
+        Args:
+            name (str): Name of the stage, used in the summary.
+            func (callable): Function run on every item, called with the item's arguments.
+            workers (int, optional): Number of worker threads. Defaults to 1.
+            queue_size (int, optional): Maximum number of pending items before submit() blocks. Defaults to 64.
+        """
+        self.name = name
+        self.func = func
+        self.queue_size = queue_size
+        self.items = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+        # Time spent in func, to tell which stage a run is waiting on
+        self.stats_lock = threading.Lock()
+        self.processed = 0
+        self.busy_time = 0.0
+
+        self.threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, item):
+        """
+        Queues an item, blocking while the queue is full.
+
+        Args:
+            item (tuple): Arguments of func.
+
+        Returns:
+            Future: Future of the result of func.
+        """
+        if self.closed:
+            raise RuntimeError(f"Stage {self.name} is closed")
+        future = Future()
+        self.items.put((future, item))
+        return future
+
+    def worker(self):
+        """
+        Runs func on the queued items until a stop marker is received.
+        """
+        while True:
+            job = self.items.get()
+            if job is None:
+                return
+            future, item = job
+            # Items cancelled by map() are dropped without running
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                future.set_result(self.func(*item))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self.stats_lock:
+                    self.processed += 1
+                    self.busy_time += time.perf_counter() - start
+
+    def map(self, items):
+        """
+        Runs func on every item across the workers, keeping at most queue_size items ahead of the consumer.
+        Closing the generator cancels the items not started yet and waits for the running ones.
+
+        Args:
+            items (iterable): Arguments of func, one tuple per item.
+
+        Yields:
+            tuple: Each item and its result, in the order of items.
+        """
+        in_flight = deque()
+        try:
+            for item in items:
+                in_flight.append((item, self.submit(item)))
+                if len(in_flight) >= self.queue_size:
+                    item, future = in_flight.popleft()
+                    yield item, future.result()
+            while in_flight:
+                item, future = in_flight.popleft()
+                yield item, future.result()
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+            wait([future for _, future in in_flight])
+
+    def print_summary(self):
+        """
+        Prints the number of items processed and the mean time spent on each, and starts a new recording.
+        """
+        with self.stats_lock:
+            if self.processed:
+                print(f"-- {self.name.capitalize()} stage: {self.processed} items, "
+                      f"mean {self.busy_time / self.processed:.2f}s per item")
+            self.processed = 0
+            self.busy_time = 0.0
+
+    def close(self):
+        """
+        Stops the worker threads once the queued items are processed.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self.threads:
+            self.items.put(None)
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,202 @@
+import os
+from os.path import join, exists
+import json
+import time
+import pickle as pkl
+
+
+class ProgressJournal:
+    """
+    An append-only progress journal next to the log.pkl snapshot of a tag directory.
+
+    Every collected post is appended as one JSON line to log.jsonl, flushed to the OS
+    right away so it survives the process being killed and fsynced in batches. The
+    journal is periodically compacted into log.pkl, which keeps the
+    [collected_images, last_page] layout of the old log files followed by the downloads
+    that were not finished yet.
+    """
+    def __init__(self,
+                 output_dir,
+                 sync_every=32,
+                 sync_interval=5.0,
+                 compact_every=1000):
+        """
+        Initializes the ProgressJournal for a tag directory.
+
+        Args:
+            output_dir (str): Directory holding log.pkl and log.jsonl.
+            sync_every (int, optional): Number of records between fsyncs. Defaults to 32.
+            sync_interval (float, optional): Maximum number of seconds between fsyncs. Defaults to 5.0.
+            compact_every (int, optional): Minimum number of journal records before compaction. Defaults to 1000.
+        """
+        self.output_dir = output_dir
+        self.snapshot_path = join(output_dir, 'log.pkl')
+        self.journal_path = join(output_dir, 'log.jsonl')
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+
+        self.file = None
+        self.downloads = {}
+        self.records = 0
+        self.snapshot_size = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def exists(self):
+        """
+        Checks whether any progress was recorded for the tag.
+
+        Returns:
+            bool: True if a snapshot or journal exists, False otherwise.
+        """
+        return exists(self.snapshot_path) or exists(self.journal_path)
+
+    def load(self):
+        """
+        Loads the snapshot and replays the journal on top of it.
+
+        Returns:
+            tuple: The list of collected post URLs and the last page.
+        """
+        collected_images, last_page = [], 0
+        self.downloads = {}
+        if exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pkl.load(f)
+            collected_images, last_page = snapshot[:2]
+            if len(snapshot) > 2:
+                self.downloads = dict(snapshot[2])
+        self.snapshot_size = len(collected_images)
+
+        self.records = 0
+        if exists(self.journal_path):
+            seen = set(collected_images)
+            end = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn last line from a killed process, cut off below so the
+                        # next record is not appended to it
+                        break
+                    end += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A record an older run appended to a torn line
+                        continue
+                    self.records += 1
+                    post_url = record.get('post')
+                    if post_url is not None and post_url not in seen:
+                        collected_images.append(post_url)
+                        seen.add(post_url)
+                    if 'file' in record:
+                        self.downloads[record['file']] = record['url']
+                    last_page = max(last_page, record.get('last_page', 0))
+            if end < os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(end)
+        return collected_images, last_page
+
+    def pending_downloads(self):
+        """
+        Returns the recorded downloads whose file is not in the tag directory.
+
+        Returns:
+            dict: Image URLs by file name.
+        """
+        return {file_name: image_url for file_name, image_url in self.downloads.items()
+                if not exists(join(self.output_dir, file_name))}
+
+    def open(self):
+        """
+        Opens the journal for appending.
+        """
+        if self.file is None:
+            self.file = open(self.journal_path, 'a')
+
+    def append(self, post_url, last_page, collected_images, image_url=None, file_name=None):
+        """
+        Records a collected post, compacting the journal when it grew large enough.
+
+        Args:
+            post_url (str): URL of the collected post.
+            last_page (int): Last page with new posts.
+            collected_images (list): Collected post URLs, including post_url.
+            image_url (str, optional): URL of the image queued for the post. Defaults to None.
+            file_name (str, optional): Name the image is saved as. Defaults to None.
+        """
+        record = {'post': post_url, 'last_page': last_page}
+        if file_name is not None:
+            # Kept until the file exists, so an interrupted download is resumed on the next run
+            record.update({'url': image_url, 'file': file_name})
+            self.downloads[file_name] = image_url
+        self.open()
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        self.records += 1
+        self.unsynced += 1
+
+        if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+        # Compacting once the journal is as long as the snapshot keeps the
+        # amortized checkpoint cost constant per post
+        if self.records >= max(self.compact_every, self.snapshot_size):
+            self.compact(collected_images, last_page)
+
+    def record_page(self, last_page):
+        """
+        Records a new last page.
+
+        Args:
+            last_page (int): Last page with new posts.
+        """
+        self.open()
+        self.file.write(json.dumps({'last_page': last_page}) + '\n')
+        self.file.flush()
+        self.records += 1
+        self.unsynced += 1
+
+    def sync(self):
+        """
+        Forces the journal to disk.
+        """
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def compact(self, collected_images, last_page):
+        """
+        Atomically rewrites the snapshot and truncates the journal.
+
+        Args:
+            collected_images (list): Collected post URLs.
+            last_page (int): Last page with new posts.
+        """
+        self.downloads = self.pending_downloads()
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pkl.dump([collected_images, last_page, self.downloads], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Records left over by a crash before the truncation are skipped on replay
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.journal_path, 'w')
+        self.records = 0
+        self.unsynced = 0
+        self.snapshot_size = len(collected_images)
+
+    def close(self):
+        """
+        Syncs and closes the journal.
+        """
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
@@ -0,0 +1,228 @@
+import time
+import threading
+import urllib.parse
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header.
+
+    Args:
+        value (str): Header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        float: Number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_challenge(status, headers):
+    """
+    Detects a Cloudflare challenge from the response headers, without reading the body.
+
+    Args:
+        status (int): HTTP status code.
+        headers (Mapping): Response headers.
+
+    Returns:
+        bool: True if the response is a challenge page.
+    """
+    if headers.get("cf-mitigated", "").lower() == "challenge":
+        return True
+    return status in (403, 503) and headers.get("Server", "").lower() == "cloudflare"
+
+
+class TokenBucket:
+    """
+    The request budget of one host.
+    """
+    def __init__(self, rate, capacity):
+        """
+        Initializes a full TokenBucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum number of tokens, i.e. the burst size.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.decreased = 0.0
+
+
+class RateLimiter:
+    """
+    A per-host token-bucket rate limiter whose rates adapt AIMD-style: every fast successful
+    response adds to the rate of its host, every 429, 5xx, challenge or slow response divides it.
+    """
+    # Statuses telling the client to slow down
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self,
+                 rate=2.0,
+                 burst=4,
+                 min_rate=0.2,
+                 max_rate=20.0,
+                 increase=0.1,
+                 decrease=0.5,
+                 latency_target=2.0,
+                 cooldown=1.0,
+                 challenge_pause=30.0):
+        """
+        Initializes the RateLimiter with the given parameters.
+
+        Args:
+            rate (float, optional): Initial number of requests per second for every host. Defaults to 2.0.
+            burst (float, optional): Number of requests a host can receive at once. Defaults to 4.
+            min_rate (float, optional): Lowest rate of a host. Defaults to 0.2.
+            max_rate (float, optional): Highest rate of a host, raised to rate if it is lower. Defaults to 20.0.
+            increase (float, optional): Rate added after a successful response. Defaults to 0.1.
+            decrease (float, optional): Factor the rate is multiplied by after an error. Defaults to 0.5.
+            latency_target (float, optional): Response time in seconds above which a host is considered overloaded. Defaults to 2.0.
+            cooldown (float, optional): Minimum number of seconds between two decreases of the same host. Defaults to 1.0.
+            challenge_pause (float, optional): Number of seconds a host is paused after a challenge page. Defaults to 30.0.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        # An initial rate above max_rate would be cut back to it by the first successful response
+        self.max_rate = max(max_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.challenge_pause = challenge_pause
+        self.buckets = {}
+        self.lock = threading.Lock()
+        # Time every thread spent blocked in acquire(), so page load timings can leave it out
+        self.local = threading.local()
+
+    def bucket(self, url):
+        """
+        Returns the bucket of the host of a URL, creating it if needed. Must be called with the lock held.
+
+        Args:
+            url (str): URL to request.
+
+        Returns:
+            TokenBucket: Bucket of the host.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    def reserve(self, url):
+        """
+        Takes a token for a request and returns how long to wait before sending it.
+
+        Args:
+            url (str): URL to request.
+
+        Returns:
+            float: Number of seconds to wait.
+        """
+        with self.lock:
+            bucket = self.bucket(url)
+            now = time.monotonic()
+            # updated is in the future while the host is paused
+            if now > bucket.updated:
+                bucket.tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                bucket.updated = now
+            bucket.tokens -= 1
+            delay = bucket.updated - now
+            if bucket.tokens < 0:
+                delay += -bucket.tokens / bucket.rate
+            return delay
+
+    def acquire(self, url):
+        """
+        Blocks until a request to the host of a URL is allowed.
+
+        Args:
+            url (str): URL to request.
+        """
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+            self.local.waited = self.waited() + delay
+
+    def waited(self):
+        """
+        Returns the total time the calling thread spent blocked in acquire().
+
+        Returns:
+            float: Seconds waited.
+        """
+        return getattr(self.local, "waited", 0.0)
+
+    def pause(self, url, seconds):
+        """
+        Stops sending requests to the host of a URL for a while.
+
+        Args:
+            url (str): URL of the host.
+            seconds (float): Number of seconds to pause.
+        """
+        with self.lock:
+            bucket = self.bucket(url)
+            bucket.tokens = min(bucket.tokens, 0)
+            bucket.updated = max(bucket.updated, time.monotonic() + seconds)
+
+    def record(self, url, status=None, latency=None, retry_after=None, challenge=False):
+        """
+        Adjusts the rate of the host of a URL from the outcome of a request.
+
+        Args:
+            url (str): Requested URL.
+            status (int, optional): HTTP status code, None if the request failed.
+            latency (float, optional): Response time in seconds.
+            retry_after (str, optional): Retry-After header of the response.
+            challenge (bool, optional): Whether a challenge page was returned. Defaults to False.
+
+        Returns:
+            bool: True if the host asked to slow down and the request should be retried later.
+        """
+        throttled = challenge or status in self.THROTTLE_STATUSES
+        failed = throttled or status is None or status >= 500
+        slow = latency is not None and latency > self.latency_target
+
+        with self.lock:
+            bucket = self.bucket(url)
+            now = time.monotonic()
+            if failed or slow:
+                # Decrease at most once per cooldown, requests already in flight report the same congestion
+                if now - bucket.decreased >= self.cooldown:
+                    bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                    bucket.decreased = now
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+
+        wait = parse_retry_after(retry_after)
+        if challenge:
+            wait = max(wait or 0, self.challenge_pause)
+            print(f"- Challenge page from {urllib.parse.urlsplit(url).netloc}, pausing for {wait:.0f}s")
+        if wait:
+            self.pause(url, wait)
+        return throttled
+
+    def rates(self):
+        """
+        Returns the current rate of every host.
+
+        Returns:
+            dict: Requests per second by host.
+        """
+        with self.lock:
+            return {host: bucket.rate for host, bucket in self.buckets.items()}
@@ -1,22 +1,24 @@
-import os
-from os import listdir
-from os.path import join
+import threading
 import json
-import time
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import pickle as pkl
-import selenium
 import argparse
 from datetime import datetime
 import urllib.parse
+from functools import partial
+from booru_scraper import BooruScraper
+from rate_limiter import is_challenge
+from html_parsing import parse_html, LISTING_STRAINER, SANKAKU_POST_STRAINER
 
-class SankakuScraper:
+class SankakuScraper(BooruScraper):
     """
     A scraper for Sankaku Complex that collects images and metadata based on specified tags and ratings.
     """
+    SITE = "sankaku"
+    METADATA_DIR = "labels"
+    # Tag types always present in the metadata, in the order they are saved
+    TAG_TYPES = ["artist", "copyright", "character", "genre", "fashion", "anatomy", "pose", "activity",
+                 "entity", "object", "substance", "setting", "general", "meta", "automatic"]
+
     def __init__(self, 
                  data_name, 
                  tags=None, 
@@ -27,6 +29,22 @@ class SankakuScraper:
                  ai_only=False,
                  base_dir = "scraped_images",
                  video_flag = 0,
+                 backend="http",
+                 cookie_file_path='skkc_cookie.txt',
+                 download_workers=4,
+                 download_per_host=None,
+                 chunk_size=1024 * 1024,
+                 timeout=60,
+                 dedup_across_tags=False,
+                 metadata_sink="json",
+                 page_timeout=10,
+                 browser_workers=1,
+                 queue_size=64,
+                 selective_parse=True,
+                 request_rate=2.0,
+                 content_store=False,
+                 lean_browser=True,
+                 metrics_port=None,
                  base_url="https://chan.sankakucomplex.com"):
         """
         Initializes the SankakuScraper with the given parameters.
@@ -41,60 +59,88 @@ class SankakuScraper:
             ai_only (bool, optional): Whether to include only AI-created images. Defaults to False.
             base_dir (str, optional): Base directory for saving scraped images. Defaults to "scraped_images".
             video_flag (int, optional): Flag to include videos. Defaults to 0.
+            backend (str, optional): Fetch backend, "http" with a cookie session or "browser". Defaults to "http".
+            cookie_file_path (str, optional): Path to the Netscape cookie file. Defaults to 'skkc_cookie.txt'.
+            download_workers (int, optional): Number of concurrent image downloads. Defaults to 4.
+            download_per_host (int, optional): Maximum number of concurrent image downloads from one host, across the tag workers. Defaults to download_workers.
+            chunk_size (int, optional): Size of the chunks written while downloading. Defaults to 1 MiB.
+            timeout (float, optional): HTTP request timeout in seconds. Defaults to 60.
+            dedup_across_tags (bool, optional): Whether a post collected under one tag is skipped under the others. Defaults to False.
+            metadata_sink (str, optional): Where metadata is written, "json" files or a "sqlite" database. Defaults to "json".
+            page_timeout (float, optional): Maximum number of seconds to wait for a page to be ready. Defaults to 10.
+            browser_workers (int, optional): Number of sessions or browsers loading post pages in parallel. Defaults to 1.
+            queue_size (int, optional): Maximum number of posts waiting in the fetch and download queues. Defaults to 64.
+            selective_parse (bool, optional): Whether only the subtrees read by the scraper are parsed. Defaults to True.
+            request_rate (float, optional): Initial number of requests per second sent to each host. Defaults to 2.0.
+            content_store (bool, optional): Whether images are kept once in a content-addressed store and hardlinked into the tag directories. Defaults to False.
+            lean_browser (bool, optional): Whether Chrome skips images, media, fonts, stylesheets and ads. Defaults to True.
+            metrics_port (int, optional): Port of the Prometheus metrics endpoint, not served if None. Defaults to None.
             base_url (str, optional): Base URL for Sankaku Complex. Defaults to "https://chan.sankakucomplex.com".
         """
-        self.base_url = base_url
-        self.data_name = data_name
-        self.rating_to_scrape = rating
-        self.full_image = full_image
-        self.single_character = single_character
+        # Read by tag_query()
         self.no_ai = no_ai
         self.ai_only = ai_only
-        self.base_dir = base_dir
-        
-        if video_flag == 0:
-            self.allowed_formats = {"jpg", "jpeg", "png", "webp"}
-        elif video_flag == 1:
-            self.allowed_formats = {"jpg", "jpeg", "png", "webp", 'webm', 'mp4', 'mov'}
-        elif video_flag == 2:
-            self.allowed_formats = {'webm', 'mp4', 'mov'}
-
-        self.output_dir = join(self.base_dir, data_name)
-        if tags is None:
-            with open("tags.txt", "r") as file:
-                self.tags_list = [line.strip() for line in file.readlines()]
-        elif self.single_character:
-            self.character_name = tags[0]
-            self.tags_list = tags
+        super().__init__(data_name,
+                         tags=tags,
+                         rating=rating,
+                         full_image=full_image,
+                         single_character=single_character,
+                         base_dir=base_dir,
+                         video_flag=video_flag,
+                         download_workers=download_workers,
+                         download_per_host=download_per_host,
+                         chunk_size=chunk_size,
+                         timeout=timeout,
+                         dedup_across_tags=dedup_across_tags,
+                         metadata_sink=metadata_sink,
+                         page_timeout=page_timeout,
+                         browser_workers=browser_workers,
+                         queue_size=queue_size,
+                         selective_parse=selective_parse,
+                         request_rate=request_rate,
+                         content_store=content_store,
+                         lean_browser=lean_browser,
+                         metrics_port=metrics_port,
+                         base_url=base_url)
+
+        # Initialize the fetch backend, the WebDriver is only started when needed
+        self.backend = backend
+        self.cookie_file_path = cookie_file_path
+        self.backend_lock = threading.Lock()
+        if self.backend == "http":
+            self.add_cookies_to_session(self.load_cookies_from_file(self.cookie_file_path))
         else:
-            self.tags_list = tags
+            self.initialize_webdriver()
 
+    def tag_query(self, tag):
+        """
+        Adds the site-specific filters to a tag query.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: The tag query sent to Sankaku Complex.
+        """
         if self.rating_to_scrape is not None and len(self.rating_to_scrape) == 1:
-            for i in range(len(self.tags_list)):
-                self.tags_list[i] = self.tags_list[i] + f'+rating%3A{self.rating_to_scrape[0]}'
+            tag = tag + f'+rating%3A{self.rating_to_scrape[0]}'
         if self.no_ai:
-            for i in range(len(self.tags_list)):
-                self.tags_list[i] = self.tags_list[i] + '+-ai-created'
+            tag = tag + '+-ai-created'
         if self.ai_only:
-            for i in range(len(self.tags_list)):
-                self.tags_list[i] = self.tags_list[i] + '+ai-created'
-        for i in range(len(self.tags_list)):
-            self.tags_list[i] = self.tags_list[i] + '+-holostars'
-
-        # Ensure output directory exists
-        os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-
-        # Initialize page number and collected_images
-        self.page_num = 1
-        self.last_page = 0
-        self.clear_pages_count = 0
-        self.clear_pages_limit = 3
-        self.scrape = True
-        self.end_of_page = False
-        self.collected_images = []
-
-        # Initialize WebDriver
-        self.initialize_webdriver()
+            tag = tag + '+ai-created'
+        return tag + '+-holostars'
+
+    def listing_url(self, tag):
+        """
+        Builds the URL of the listing pages of a tag.
+
+        Args:
+            tag (str): URL-encoded tag query.
+
+        Returns:
+            str: URL with a {page_num} placeholder.
+        """
+        return f"{self.base_url}/en/posts?page={{page_num}}&tags={tag}"
 
     def load_cookies_from_file(self, cookie_file_path):
         """
@@ -125,107 +171,170 @@ class SankakuScraper:
                         cookies.append(cookie)
         return cookies
 
-    def add_cookies_to_driver(self, cookies):
+    def add_cookies_to_driver(self, cookies, driver=None):
         """
         Adds cookies to the WebDriver.
 
         Args:
             cookies (list): List of cookies to add.
+            driver (WebDriver, optional): WebDriver to add the cookies to. Defaults to self.driver.
         """
-        self.driver.get('https://chan.sankakucomplex.com')
+        driver = driver if driver is not None else self.driver
+        driver.get(self.base_url)
 
         for cookie in cookies:
-            self.driver.add_cookie(cookie)
+            driver.add_cookie(cookie)
 
-    def initialize_webdriver(self, cookie_file_path = 'skkc_cookie.txt'):
+    def add_cookies_to_session(self, cookies):
         """
-        Initializes the WebDriver with the specified cookies.
+        Adds cookies to the pooled HTTP session.
 
         Args:
-            cookie_file_path (str, optional): Path to the cookie file. Defaults to 'skkc_cookie.txt'.
+            cookies (list): List of cookies to add.
         """
-        cookies = self.load_cookies_from_file(cookie_file_path)
+        for cookie in cookies:
+            self.http.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                          path=cookie['path'], secure=cookie['secure'], expires=cookie['expiry'])
 
-        # Headless browser setup
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--enable-unsafe-swiftshader")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36")
-        chrome_options.add_argument("--log-level=3")
-        chrome_options.add_argument("--disable-logging")
+    def create_webdriver(self):
+        """
+        Creates a headless WebDriver with the cookies of the cookie file.
 
-        # Initialize the WebDriver
-        self.driver = webdriver.Chrome(options=chrome_options)
+        Returns:
+            WebDriver: The new WebDriver.
+        """
+        cookies = self.load_cookies_from_file(self.cookie_file_path)
+        driver = super().create_webdriver()
+        self.add_cookies_to_driver(cookies, driver)
+        return driver
 
-        self.add_cookies_to_driver(cookies)
+    def chrome_options(self):
+        """
+        Returns the options of the headless Chrome browsers.
 
+        Returns:
+            Options: Chrome options.
+        """
+        chrome_options = super().chrome_options()
+        chrome_options.add_argument("--enable-unsafe-swiftshader")
+        return chrome_options
 
-    def scrape_page(self, max_images):
+    def discover(self):
         """
-        Scrapes a page for images and metadata.
+        Lists the posts of the current page.
 
-        Args:
-            max_images (int): Maximum number of images to scrape.
+        Returns:
+            list: List of (post_url, None) pairs, or None at the end of the results.
         """
         url = self.search_url.format(page_num=self.page_num)
-        header = f" \"{urllib.parse.unquote(self.cur_tag.split('+')[0])}\" page {self.page_num} "
-        print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
-        self.driver.get(url)
-        time.sleep(2)  # Allow the page to load
+        with self.timed_load("listing"):
+            html = self.load_page(self.driver, url, "div.posts-container")
 
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+        with self.timed("parse_seconds", page="listing"):
+            soup = parse_html(html,
+                              LISTING_STRAINER if self.selective_parse else None,
+                              ("div.posts-container",))
         posts_containers = soup.find_all("div", class_="posts-container gap-2")
 
         if not posts_containers:
-            self.end_of_page = True
-            return
+            return None
 
+        entries = []
         for posts_container in posts_containers:
-            article_elements = posts_container.find_all("article")
-            clear_count = 0
-            for article in article_elements:
-                if len(self.collected_images) >= max_images:
-                    return  # Stop scraping if the desired number of images is reached
+            for article in posts_container.find_all("article"):
                 link = article.find("a", href=True)
                 if link:
-                    post_url = self.base_url + link['href']
-                    if post_url not in self.collected_images and self.process_post(post_url):
-                        self.collected_images.append(post_url)
-                        # Save progress to log file
-                        pkl.dump([self.collected_images, self.last_page], open(join(self.output_dir, 'log.pkl'), 'wb'))
-                        print(f"- Collected {len(self.collected_images)}/{max_images}")
-                    else:
-                        clear_count += 1
-            if clear_count == len(article_elements):
-                self.clear_pages_count += 1
-            else:
-                self.clear_pages_count = 0
-                if self.page_num > self.last_page:
-                    self.last_page = self.page_num
-                    print(f"\n{'*'*100}")
-                    print(f"\nNew last page: {self.last_page}")
-            if self.clear_pages_count == self.clear_pages_limit:
-                header = f" Jumping to page {self.last_page} "
-                print(f"\n{'-'*((100-(len(header)))//2)}{header}{'-'*((100-(len(header)))//2)}")
-                self.page_num = self.last_page-1
-
-    def process_post(self, post_url):
-        """
-        Processes a post to extract image and metadata.
+                    entries.append((self.base_url + link['href'], None))
+        return entries
+
+    def load_page(self, driver, url, selector):
+        """
+        Loads a page over the cookie session, or in a WebDriver with the browser backend.
+        A challenge page switches the scraper to the browser backend.
+
+        Args:
+            driver (WebDriver): WebDriver to load the page in with the browser backend.
+            url (str): URL to load.
+            selector (str): CSS selector of the element the browser waits for.
+
+        Returns:
+            str: Page source.
+
+        Raises:
+            requests.exceptions.HTTPError: If the page could not be loaded over HTTP after the retries.
+        """
+        if self.backend == "http":
+            response = self.http.get(url)
+            if not is_challenge(response.status_code, response.headers):
+                # An error page is not an empty listing, the page is loaded again instead
+                response.raise_for_status()
+                return response.text
+            with self.backend_lock:
+                if self.backend == "http":
+                    print("- Challenge page over HTTP, falling back to Chrome")
+                    self.initialize_webdriver()
+                    self.backend = "browser"
+        if driver is None:
+            if self.driver_pool is not None:
+                # Switched from the HTTP backend, borrow a browser of the pool
+                return self.driver_pool.run(partial(self.load_in_browser, selector=selector), url,
+                                            tag=self.tag_name())
+            driver = self.driver
+        return self.load_in_browser(driver, url, selector)
+
+    def load_in_browser(self, driver, url, selector):
+        """
+        Loads a page in a WebDriver and waits for the target element.
 
         Args:
-            post_url (str): URL of the post to process.
+            driver (WebDriver): WebDriver to load the page in.
+            url (str): URL to load.
+            selector (str): CSS selector of the element to wait for.
 
         Returns:
-            bool: True if the post was processed successfully, False otherwise.
+            str: Page source.
         """
-        self.driver.get(post_url)
-        time.sleep(2)
+        self.page_waiter.load(driver, url, selector)
+        return driver.page_source
 
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+    def fetch_post(self, post_url, listing):
+        """
+        Loads a post page over the cookie session or in a browser and extracts its image and metadata.
+
+        Args:
+            post_url (str): URL of the post.
+            listing (None): Nothing is read from the listing.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        return self.load_post(post_url)
+
+    def parse_post(self, driver, post_url):
+        """
+        Loads a post page and extracts its image and metadata.
+
+        Args:
+            driver (WebDriver): WebDriver to load the page in, None with the HTTP backend.
+            post_url (str): URL of the post to parse.
+
+        Returns:
+            tuple: The image URL, image extension and metadata, or None if the post is rejected.
+        """
+        try:
+            with self.timed_load("post"):
+                html = self.load_page(driver, post_url, "#highres" if self.full_image else "#image")
+        except requests.exceptions.HTTPError as e:
+            # Deleted posts stay in the listing for a while
+            if e.response is None or e.response.status_code != 404:
+                raise
+            self.count_rejection("not_found")
+            return None
+
+        with self.timed("parse_seconds", page="post"):
+            soup = parse_html(html,
+                              SANKAKU_POST_STRAINER if self.selective_parse else None,
+                              ("#stats", "#tag-sidebar"))
         if not self.full_image:
             image = soup.select_one("#image-link img")
         else:
@@ -234,30 +343,25 @@ class SankakuScraper:
         if image and (image.has_attr("src") or image.has_attr("href")):
             image_url = image["src"] if not self.full_image else image["href"]
             
-            # Ensure the image URL is complete
-            # if not image_url.startswith("http"):
-            #     image_url = self.base_url + image_url
-            image_url = 'https:' + image_url
+            # Ensure the image URL is complete, the page links protocol-relative URLs
+            image_url = urllib.parse.urljoin(self.base_url, image_url)
             
             original_image_name = image_url.split('?')[0].split("/")[-1]
             image_extension = original_image_name.split("?")[0].split(".")[-1].lower()
 
             post_id = self.extract_post_id(soup)
             rating = self.extract_rating(soup)
-            characters = self.extract_tags(soup, "li.tag-type-character")
+            tag_groups = self.extract_tag_groups(soup)
+            characters = tag_groups["character"]
 
             if image_extension not in self.allowed_formats:
-                return False
+                self.count_rejection("format")
+                return None
             elif self.single_character:
                 for character in characters:
                     if self.character_name not in character:
-                        return False
-            
-            print(f"\n- Processing: {post_url}")
-
-            new_filename = f"{self.cur_tag.split('+')[0]}_{(5-len(str(len(self.collected_images)+1)))*'0'}{len(self.collected_images)+1}"
-            # Download the image
-            self.download_image(image_url, f"{new_filename}.{image_extension}")
+                        self.count_rejection("character")
+                        return None
 
             # Scrape the metadata
             metadata = {
@@ -265,29 +369,12 @@ class SankakuScraper:
                 "rating": rating,
                 "original_url": post_url,
                 "original_filename": original_image_name,
-                "tags": {
-                    "artist": self.extract_tags(soup, "li.tag-type-artist"),
-                    "copyright": self.extract_tags(soup, "li.tag-type-copyright"),
-                    "character": characters,
-                    "genre": self.extract_tags(soup, "li.tag-type-genre"),
-                    "fashion": self.extract_tags(soup, "li.tag-type-fashion"),
-                    "anatomy": self.extract_tags(soup, "li.tag-type-anatomy"),
-                    "pose": self.extract_tags(soup, "li.tag-type-pose"),
-                    "activity": self.extract_tags(soup, "li.tag-type-activity"),
-                    "entity": self.extract_tags(soup, "li.tag-type-entity"),
-                    "object": self.extract_tags(soup, "li.tag-type-object"),
-                    "substance": self.extract_tags(soup, "li.tag-type-substance"),
-                    "setting": self.extract_tags(soup, "li.tag-type-setting"),
-                    "general": self.extract_tags(soup, "li.tag-type-general"),
-                    "meta": self.extract_tags(soup, "li.tag-type-meta"),
-                    "automatic": self.extract_tags(soup, "li.tag-type-automatic")
-                },
+                "tags": tag_groups,
             }
 
-            # Save metadata as JSON
-            self.save_metadata(f"{new_filename}.{image_extension}", metadata)
-            return True
-        return False
+            return image_url, image_extension, metadata
+        self.count_rejection("no_image")
+        return None
 
     def extract_rating(self, soup):
         """
@@ -373,52 +460,25 @@ class SankakuScraper:
                 return link["href"]
         return None
     
-    def extract_tags(self, soup, selector):
+    def extract_tag_groups(self, soup):
         """
-        Extracts tags from the specified element.
+        Extracts every tag of the tag sidebar in one traversal, grouped by tag type.
 
         Args:
             soup (BeautifulSoup): Parsed HTML document.
-            selector (str): CSS selector for the element.
 
         Returns:
-            list: List of extracted tags.
-        """
-        tag_list = []
-        tag_container = soup.select(selector)
-        if tag_container:
-            tag_list = [li.get_text().strip() for li in tag_container]
-        return tag_list
-
-    def download_image(self, image_url, image_name):
-        """
-        Downloads an image from the specified URL.
-
-        Args:
-            image_url (str): URL of the image to download.
-            image_name (str): Name to save the downloaded image as.
-        """
-        response = requests.get(image_url, stream=True)
-        if response.status_code == 200:
-            image_path = os.path.join(self.output_dir, image_name)
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            print(f"- Image saved: {image_name}")
-
-    def save_metadata(self, image_name, metadata):
-        """
-        Saves metadata as a JSON file.
-
-        Args:
-            image_name (str): Name of the image file.
-            metadata (dict): Metadata to save.
-        """
-        json_name = os.path.splitext(image_name)[0] + ".json"
-        json_path = os.path.join(self.output_dir, 'labels', json_name)
-        with open(json_path, 'w') as f:
-            json.dump(metadata, f, indent=4)
-        print(f"- Metadata saved: {json_name}")
+            dict: Lists of tags keyed by tag type, with the known types always present
+            and any other tag-type-* class added as its own group.
+        """
+        tag_groups = {tag_type: [] for tag_type in self.TAG_TYPES}
+        tag_container = soup.find(id="tag-sidebar") or soup
+        for li in tag_container.find_all("li"):
+            for class_name in li.get("class", []):
+                if class_name.startswith("tag-type-"):
+                    tag_groups.setdefault(class_name[len("tag-type-"):], []).append(li.get_text().strip())
+                    break
+        return tag_groups
 
     def scrape_sankaku(self, pages=5):
         """
@@ -427,55 +487,7 @@ class SankakuScraper:
         Args:
             pages (int, optional): Number of pages to scrape. Defaults to 5.
         """
-        for tag in self.tags_list:
-            self.cur_tag = tag
-            if len(self.tags_list) > 1:
-                self.output_dir = join(self.base_dir, self.data_name, self.cur_tag)
-            else:
-                self.output_dir = join(self.base_dir, self.data_name)
-            os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-            self.page_num = 1
-            self.clear_pages_count = 0
-            self.scrape = True
-            self.end_of_page = False
-
-            self.search_url = f"{self.base_url}/en/posts?page={{page_num}}&tags={tag}"
-            files = listdir(self.output_dir)
-            header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" "
-            print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
-            if 'log.pkl' in files:
-                self.collected_images, self.last_page = pkl.load(open(join(self.output_dir, 'log.pkl'), 'rb'))
-                print("\n-- Log file found")
-                print(f"-- Log last page: {self.last_page}")
-            else:
-                self.collected_images = []
-                self.page_num = 1
-
-            print(f"\n{'*'*100}")
-                
-            while self.page_num <= pages and not self.end_of_page:
-                try:
-                    self.scrape_page(max_images=float('inf'))
-                    self.page_num += 1
-                    print(f"\n{'*'*100}")
-                except selenium.common.exceptions.TimeoutException:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except requests.exceptions.ConnectTimeout:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except TimeoutError:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except KeyboardInterrupt:
-                    self.scrape = False
-                    break
-            
-            print(f"\n-- Scraping complete for tag \"{tag.split('+')[0]}\"")
-            print(f"-- Total images collected: {len(self.collected_images)}")
-            print(f"-- Last page: {self.page_num-1}")
-            if not self.scrape: break
-        print(f"\n{'='*100}")
+        self.scrape_pages(pages)
 
     def scrape_sankaku_limited_by_images(self, max_images=10):
         """
@@ -484,69 +496,7 @@ class SankakuScraper:
         Args:
             max_images (int, optional): Maximum number of images to scrape. Defaults to 10.
         """
-        for tag in self.tags_list:
-            self.cur_tag = tag
-            if len(self.tags_list) > 1:
-                self.output_dir = join(self.base_dir, self.data_name, self.cur_tag)
-            else:
-                self.output_dir = join(self.base_dir, self.data_name)
-            os.makedirs(join(self.output_dir, 'labels'), exist_ok=True)
-            self.page_num = 1
-            self.clear_pages_count = 0
-            self.scrape = True
-            self.end_of_page = False
-
-            self.search_url = f"{self.base_url}/en/posts?page={{page_num}}&tags={tag}"
-            files = listdir(self.output_dir)
-            header = f" \"{urllib.parse.unquote(tag.split('+')[0])}\" "
-            print(f"\n{'='*((100-(len(header)))//2)}{header}{'='*((100-(len(header)))//2)}")
-            if 'log.pkl' in files:
-                self.collected_images, self.last_page = pkl.load(open(join(self.output_dir, 'log.pkl'), 'rb'))
-                print("\n-- Log file found")
-                print(f"-- Log last page: {self.last_page}")
-            else:
-                self.collected_images = []
-                self.page_num = 1
-
-            while len(self.collected_images) < max_images and not self.end_of_page:
-                try:
-                    self.scrape_page(max_images)
-                    self.page_num += 1
-                except selenium.common.exceptions.TimeoutException:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except requests.exceptions.ConnectTimeout:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except TimeoutError:
-                    print(f"Timeout occurred on page {self.page_num}. Restarting WebDriver.")
-                    self.restart_webdriver()
-                except KeyboardInterrupt:
-                    self.scrape = False
-                    break
-
-            print(f"\n-- Scraping complete for tag \"{tag.split('+')[0]}\"")
-            print(f"-- Total images collected: {len(self.collected_images)}")
-            print(f"-- Last page: {self.page_num-1}")
-            pkl.dump([self.collected_images, self.page_num-1], open(join(self.output_dir, 'log.pkl'), 'wb'))
-            if not self.scrape: break
-        print(f"\n{'='*100}")
-
-    def restart_webdriver(self):
-        """
-        Restarts the WebDriver.
-        """
-        # Close the current WebDriver
-        self.driver.quit()
-        time.sleep(5)  # Give some time before restarting
-        # Reinitialize the WebDriver
-        self.initialize_webdriver()
-
-    def close(self):
-        """
-        Closes the WebDriver.
-        """
-        self.driver.quit()
+        self.scrape_limited_by_images(max_images)
 
 
 if __name__ == "__main__":
@@ -635,6 +585,131 @@ if __name__ == "__main__":
         help="If set, download videos only (default: False)"
     )
 
+    # Number of concurrent image downloads
+    parser.add_argument(
+        "--download_workers", 
+        type=int, 
+        default=4, 
+        help="Number of concurrent image downloads (default: 4)"
+    )
+
+    # Concurrent image downloads from one host
+    parser.add_argument(
+        "--download_per_host", 
+        type=int, 
+        help="Maximum number of concurrent image downloads from one host (default: --download_workers)"
+    )
+
+    # Download chunk size in bytes
+    parser.add_argument(
+        "--chunk_size", 
+        type=int, 
+        default=1024 * 1024, 
+        help="Download chunk size in bytes (default: 1048576)"
+    )
+
+    # HTTP request timeout
+    parser.add_argument(
+        "--timeout", 
+        type=float, 
+        default=60, 
+        help="HTTP request timeout in seconds (default: 60)"
+    )
+
+    # Boolean flag for skipping posts already collected under another tag
+    parser.add_argument(
+        "--dedup_across_tags", 
+        action='store_true', 
+        help="If set, skip posts already collected under another tag (default: False)"
+    )
+
+    # Page load ceiling
+    parser.add_argument(
+        "--page_timeout", 
+        type=float, 
+        default=10, 
+        help="Maximum number of seconds to wait for a page to be ready (default: 10)"
+    )
+
+    # Number of workers loading post pages
+    parser.add_argument(
+        "--browser_workers", 
+        type=int, 
+        default=1, 
+        help="Number of sessions or browsers loading post pages in parallel (default: 1)"
+    )
+
+    # Bound of the fetch and download queues
+    parser.add_argument(
+        "--queue_size", 
+        type=int, 
+        default=64, 
+        help="Maximum number of posts waiting in the fetch and download queues (default: 64)"
+    )
+
+    # Initial request rate per host
+    parser.add_argument(
+        "--request_rate", 
+        type=float, 
+        default=2.0, 
+        help="Initial number of requests per second sent to each host, adjusted while scraping (default: 2.0)"
+    )
+
+    # Boolean flag for loading whole pages in Chrome
+    parser.add_argument(
+        "--full_browser", 
+        action='store_true', 
+        help="If set, let Chrome load images, stylesheets, fonts and ads (default: False)"
+    )
+
+    # Boolean flag for the content-addressed image store
+    parser.add_argument(
+        "--content_store", 
+        action='store_true', 
+        help="If set, keep every image once in a content-addressed store and hardlink it into the tag directories (default: False)"
+    )
+
+    # Number of tags scraped at the same time
+    parser.add_argument(
+        "--tag_workers", 
+        type=int, 
+        default=1, 
+        help="Number of tags scraped in parallel, each with its own browser (default: 1)"
+    )
+
+    # Boolean flag for parsing whole pages
+    parser.add_argument(
+        "--full_parse", 
+        action='store_true', 
+        help="If set, parse whole pages instead of only the relevant subtrees (default: False)"
+    )
+
+    # Fetch backend, Chrome is kept as a fallback for challenge pages
+    parser.add_argument(
+        "--backend", 
+        type=str, 
+        choices=["http", "browser"],
+        default="http", 
+        help="Fetch backend to use (default: http)"
+    )
+
+    # Metadata sink
+    parser.add_argument(
+        "--metadata_sink", 
+        type=str, 
+        choices=["json", "sqlite"],
+        default="json", 
+        help="Write metadata as JSON files or into one SQLite database (default: json)"
+    )
+
+    # Port of the Prometheus metrics endpoint
+    parser.add_argument(
+        "--metrics_port", 
+        type=int, 
+        default=None, 
+        help="Serve counters and latency histograms for Prometheus on this port (default: None)"
+    )
+
 
     args = parser.parse_args()
 
@@ -698,10 +773,25 @@ if __name__ == "__main__":
                              no_ai = no_ai,
                              ai_only = ai_only,
                              base_dir = base_dir,
-                             video_flag = video_flag)
+                             video_flag = video_flag,
+                             backend = args.backend,
+                             download_workers = args.download_workers,
+                             download_per_host = args.download_per_host,
+                             chunk_size = args.chunk_size,
+                             timeout = args.timeout,
+                             dedup_across_tags = args.dedup_across_tags,
+                             metadata_sink = args.metadata_sink,
+                             page_timeout = args.page_timeout,
+                             browser_workers = args.browser_workers,
+                             queue_size = args.queue_size,
+                             selective_parse = not args.full_parse,
+                             request_rate = args.request_rate,
+                             lean_browser = not args.full_browser,
+                             content_store = args.content_store,
+                             metrics_port = args.metrics_port)
     
     # Scrape with a limit on the number of images for each tag
-    scraper.scrape_sankaku_limited_by_images(max_images=max_img)  # Adjust max_images as needed
+    scraper.scrape(max_images=max_img, tag_workers=args.tag_workers)  # Adjust max_images as needed
     
     # Alternatively, scrape a fixed number of pages for each tag
     # scraper.scrape_sankaku(pages=5)  # Adjust the number of pages to scrape as needed
@@ -2,20 +2,54 @@ import argparse
 from danbooru_scraper import DanbooruScraper
 from sankaku_scraper import SankakuScraper
 
+SCRAPERS = {
+    'danbooru': DanbooruScraper,
+    'sankakucomplex': SankakuScraper,
+}
+
 def main():
     parser = argparse.ArgumentParser(description="BooruScraper")
-    parser.add_argument('--site', choices=['danbooru', 'sankakucomplex'], required=True, help="The site to scrape")
-    parser.add_argument('--tags', required=True, help="Tags to search for")
-    parser.add_argument('--limit', type=int, default=100, help="Number of images to download")
-    parser.add_argument('--rating', choices=['safe', 'questionable', 'explicit'], help="Filter images by rating")
+    parser.add_argument('--site', choices=list(SCRAPERS), required=True, help="The site to scrape")
+    parser.add_argument('--tags', required=True, help="Tags to search for, comma-separated searches are scraped one after the other")
+    parser.add_argument('--limit', type=int, default=100, help="Number of images to download per search")
+    parser.add_argument('--rating', help="Comma-separated ratings to keep, e.g. general,questionable")
+    parser.add_argument('--output', default='scraped_images', help="Download directory")
+    parser.add_argument('--data_name', help="Name of the dataset directory, defaults to the site and tags")
+    parser.add_argument('--sample', action='store_true', help="Download sample images instead of the originals")
+    parser.add_argument('--cookie_file', default='skkc_cookie.txt', help="Netscape cookie file for Sankaku Complex")
+    parser.add_argument('--fetch_workers', type=int, default=1, help="Workers of the fetch stage, loading post pages in parallel")
+    parser.add_argument('--download_workers', type=int, default=4, help="Workers of the download stage")
+    parser.add_argument('--download_per_host', type=int, help="Maximum number of concurrent downloads from one host, defaults to --download_workers")
+    parser.add_argument('--queue_size', type=int, default=64, help="Maximum number of posts waiting in the fetch and download queues")
+    parser.add_argument('--tag_workers', type=int, default=1, help="Number of searches scraped in parallel")
+    parser.add_argument('--metadata_sink', choices=['json', 'sqlite'], default='json', help="Write metadata as JSON files or into one SQLite database")
+    parser.add_argument('--content_store', action='store_true', help="Keep every image once and hardlink it into the tag directories")
+    parser.add_argument('--metrics_port', type=int, help="Serve counters and latency histograms for Prometheus on this port")
     args = parser.parse_args()
 
-    if args.site == 'danbooru':
-        scraper = DanbooruScraper()
-    elif args.site == 'sankakucomplex':
-        scraper = SankakuScraper()
+    searches = [search.strip().replace(' ', '+') for search in args.tags.split(',') if search.strip()]
+    site = 'sankaku' if args.site == 'sankakucomplex' else args.site
+    data_name = args.data_name or f"{site}_{'_'.join(searches)}"
+
+    options = dict(tags=searches,
+                   rating=[rating.strip().lower() for rating in args.rating.split(',')] if args.rating else None,
+                   full_image=not args.sample,
+                   base_dir=args.output,
+                   download_workers=args.download_workers,
+                   download_per_host=args.download_per_host,
+                   browser_workers=args.fetch_workers,
+                   queue_size=args.queue_size,
+                   metadata_sink=args.metadata_sink,
+                   content_store=args.content_store,
+                   metrics_port=args.metrics_port)
+    if args.site == 'sankakucomplex':
+        options['cookie_file_path'] = args.cookie_file
 
-    scraper.scrape(tags=args.tags, limit=args.limit, rating=args.rating, output=args.output)
+    scraper = SCRAPERS[args.site](data_name, **options)
+    try:
+        scraper.scrape(max_images=args.limit, tag_workers=args.tag_workers)
+    finally:
+        scraper.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,123 @@
+import queue
+import threading
+from collections import deque
+
+
+class TagScheduler:
+    """
+    Scrapes several tags of a scraper at once. Every worker owns a copy of the scraper with
+    its own browser, takes the next active tag from a round-robin queue, scrapes one page of it
+    and puts it back, so the active tags move forward at the same pace.
+    """
+    def __init__(self, scraper, workers=4, max_active_tags=None):
+        """
+        Initializes the TagScheduler and the scrapers of its workers.
+
+        Args:
+            scraper (DanbooruScraper or SankakuScraper): Scraper whose tags_list is scraped, used by the first worker.
+            workers (int, optional): Number of pages scraped at the same time. Defaults to 4.
+            max_active_tags (int, optional): Number of tags in progress at the same time. Defaults to workers.
+        """
+        self.scraper = scraper
+        self.workers = workers
+        self.max_active_tags = max_active_tags if max_active_tags is not None else workers
+        self.scrapers = [scraper] + [scraper.fork() for _ in range(workers - 1)]
+
+    def run(self, max_images=10):
+        """
+        Scrapes every tag with a limit on the number of images.
+
+        Args:
+            max_images (int, optional): Maximum number of images to scrape per tag. Defaults to 10.
+        """
+        self.max_images = max_images
+        self.pending = deque(self.scraper.tags_list)
+        self.remaining = len(self.pending)
+        self.active = queue.Queue()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        # Tags are started lazily by the first worker that picks them up
+        for _ in range(min(self.max_active_tags, len(self.pending))):
+            self.active.put(self.pending.popleft())
+        if self.remaining == 0:
+            return
+
+        threads = [threading.Thread(target=self.worker, args=(scraper,), daemon=True) for scraper in self.scrapers]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                # Join with a timeout so that KeyboardInterrupt reaches the main thread
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n-- Interrupted, finishing the active tags")
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+        print(f"\n{'='*100}")
+
+    def worker(self, scraper):
+        """
+        Scrapes pages of the active tags until every tag is finished.
+
+        Args:
+            scraper (DanbooruScraper or SankakuScraper): Scraper owned by the worker.
+        """
+        while True:
+            item = self.active.get()
+            if item is None:
+                return
+            tag = item if isinstance(item, str) else item["cur_tag"]
+
+            # A tag that is not put back is always finished, or the other workers would wait for it forever
+            requeued = False
+            try:
+                if isinstance(item, str):
+                    scraper.begin_tag(item)
+                else:
+                    scraper.load_tag_state(item)
+
+                if not self.stopped.is_set() and not scraper.tag_done(self.max_images):
+                    try:
+                        scraper.scrape_next_page(self.max_images)
+                    except Exception as e:
+                        print(f"- Page {scraper.page_num} of \"{tag.split('+')[0]}\" failed, "
+                              f"stopping the tag ({e.__class__.__name__}: {e})")
+                        scraper.end_of_page = True
+
+                if self.stopped.is_set() or scraper.tag_done(self.max_images):
+                    scraper.finish_tag()
+                else:
+                    self.active.put(scraper.save_tag_state())
+                    requeued = True
+            except Exception as e:
+                print(f"- Tag \"{tag.split('+')[0]}\" failed, stopping it ({e.__class__.__name__}: {e})")
+            finally:
+                if not requeued:
+                    self.tag_finished()
+
+    def tag_finished(self):
+        """
+        Frees the slot of a finished tag for the next pending one, and stops the workers
+        once every tag is finished.
+        """
+        with self.lock:
+            self.remaining -= 1
+            if self.stopped.is_set():
+                self.remaining -= len(self.pending)
+                self.pending.clear()
+            elif self.pending:
+                self.active.put(self.pending.popleft())
+            if self.remaining == 0:
+                for _ in self.scrapers:
+                    self.active.put(None)
+
+    def close(self):
+        """
+        Finishes the pending downloads of the workers and closes their browsers. The scraper
+        passed to the TagScheduler is closed by its owner.
+        """
+        for scraper in self.scrapers[1:]:
+            scraper.close_workers()
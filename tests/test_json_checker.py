@@ -0,0 +1,38 @@
+import json
+import os
+
+import pandas as pd
+
+from json_checker import compile_json_to_csv, count_json_files, iter_json_files
+
+
+def write_tag(base_dir, gen, talent, posts):
+    tag_dir = os.path.join(base_dir, gen, talent)
+    os.makedirs(tag_dir)
+    for post_id in range(posts):
+        with open(os.path.join(tag_dir, f"{post_id}.json"), "w") as f:
+            json.dump({"post_id": post_id, "rating": "General", "character_tags": [talent]}, f)
+    # Run summaries of the current and older scrapers next to the metadata
+    summary = {"site": "danbooru", "tag": talent, "elapsed_seconds": 1.0, "counters": {}, "histograms": {}}
+    with open(os.path.join(tag_dir, "metrics.jsonl"), "w") as f:
+        f.write(json.dumps(summary) + "\n")
+    with open(os.path.join(tag_dir, "metrics.json"), "w") as f:
+        json.dump(summary, f)
+
+
+def test_summaries_are_not_compiled(tmp_path):
+    base_dir = str(tmp_path / "scraped_images")
+    write_tag(base_dir, "gen1", "alice", 5)
+    write_tag(base_dir, "gen1", "bob", 5)
+
+    assert len(list(iter_json_files(base_dir))) == 10
+
+    counts = count_json_files(base_dir).set_index("name")
+    assert counts.loc["alice", "count"] == 5
+    assert counts.loc["bob", "count"] == 5
+
+    output = str(tmp_path / "compiled.csv")
+    assert compile_json_to_csv(base_dir, output, workers=1) == 10
+    df = pd.read_csv(output)
+    assert len(df) == 10
+    assert not {"site", "tag", "elapsed_seconds", "counters", "histograms"} & set(df.columns)
@@ -0,0 +1,44 @@
+from progress_journal import ProgressJournal
+
+
+def run(output_dir, posts):
+    """Resumes the tag, records posts and is killed before the journal is compacted."""
+    journal = ProgressJournal(output_dir)
+    collected_images, last_page = journal.load()
+    for post_url in posts:
+        collected_images.append(post_url)
+        journal.append(post_url, last_page + 1, collected_images)
+    journal.sync()
+    journal.file.close()
+    return collected_images
+
+
+def tear(output_dir):
+    """Leaves half a record at the end of the journal, as a process killed mid-write does."""
+    with open(f"{output_dir}/log.jsonl", "a") as f:
+        f.write('{"post": "torn", "last_pa')
+
+
+def test_kill_resume_resume(tmp_path):
+    output_dir = str(tmp_path)
+    run(output_dir, ["p1", "p2"])
+    tear(output_dir)
+    run(output_dir, ["p3", "p4"])
+    tear(output_dir)
+    run(output_dir, ["p5", "p6"])
+
+    collected_images, last_page = ProgressJournal(output_dir).load()
+    assert collected_images == ["p1", "p2", "p3", "p4", "p5", "p6"]
+    assert last_page == 3
+
+
+def test_records_after_a_glued_line_are_replayed(tmp_path):
+    output_dir = str(tmp_path)
+    with open(f"{output_dir}/log.jsonl", "w") as f:
+        f.write('{"post": "p1", "last_page": 1}\n')
+        f.write('{"post": "p2", "last_pa{"post": "p3", "last_page": 1}\n')
+        f.write('{"post": "p4", "last_page": 2}\n')
+
+    collected_images, last_page = ProgressJournal(output_dir).load()
+    assert collected_images == ["p1", "p4"]
+    assert last_page == 2